@@ -1,18 +1,37 @@
 # -*- coding: UTF-8 -*-
 """Module to read and parse DICOM tag data from text files."""
 import argparse
+import functools
 import inspect
+import io
+import itertools
 import math
 import os
 import string
 import sys
 import time
 import pathlib
+import sqlite3
+import tarfile
+import zipfile
+import zlib
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
 import xlsxwriter
+from pylibs import archive_tools
 from pylibs import config
+from pylibs import diff_tools
 from pylibs import file_tools
 from pylibs import dicom_tools
+from pylibs import dump_emitter
+from pylibs import dump_pack
+from pylibs import prefetch_tools
+from pylibs import sample_tools
+from pylibs import scan_budget
+from pylibs import shard_tools
+from pylibs import store_scp
+from pylibs import transfer_store
 
 BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
 PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
@@ -24,6 +43,7 @@ MAX_EXCEL_TAB = 31
 
 ALPHABET = string.ascii_uppercase
 VALID_CHARS = f"-_.()~{ALPHABET}{string.digits}"
+OUT_OF_WINDOW = 'outside date window'  # skipped, not quarantined
 
 
 def get_header_column_widths(input_tag_list: list) -> dict:
@@ -169,122 +189,1024 @@ def get_tag_indices(tags: list, lines: list,
     return tag_indices_dict
 
 
-def parse_dicom_tag_dump(input_headers: list,
-                         input_path: pathlib.Path) -> list:
-    """Parse DICOM desired tag data from input .txt files."""
+def parse_line_value(line_str: str, is_fuji: bool, is_dcmtk: bool):
+    """Returns tag value of a single dump line, None if line has no value."""
+    if is_dcmtk:
+        # parse value between square brackets [..]
+        if '[' in line_str:
+            return line_str.split('[', 1)[1].split(']')[0]
+        if '=' in line_str:
+            return line_str.split('=', 1)[1].split('#')[0].strip()
+    elif is_fuji:
+        # parse value between double quotes "..."
+        if '"' in line_str:
+            return line_str.split('"', 1)[1].split('"')[0]
+    return None
+
+
+def parse_tag_dump_lines(lines_list: list, this_file: str) -> list:
+    """Extracts desired tag values from the lines of a single tag dump."""
+    parsed_file_list = []
+    # dynamically determine which input file format:
+    (is_fuji, is_dcmtk) = is_fuji_tag_dump(lines_list[0:5])
+    if is_fuji:
+        elements = dicom_tools.build_fuji_tag_dict(this_file)
+    elif is_dcmtk:
+        elements = dicom_tools.build_dcmtk_tag_dict(this_file)
+    else:
+        elements = None  # input '.txt' not a tag dump
+    if elements:
+        # re-initializes output dict for each file to blank values
+        tag_dict = OrderedDict([(hdr, '') for hdr in list(elements.keys())])
+        tag_dict['filename'] = os.path.split(this_file)[-1]
+        # using values: tag '(0008,0050)' or '0008 0050'
+        tag_indices = get_tag_indices(list(elements.values()), lines_list)
+        tag_num = 0
+        for tag_key, tag_value in elements.items():
+            tag_num += 1
+            line_str = tag_indices[tag_value]
+            if len(tag_indices) > 0:
+                target_value = parse_line_value(line_str, is_fuji, is_dcmtk)
+                if target_value is not None:
+                    tag_dict[tag_key] = target_value
+            if config.DEBUG:
+                print(f"tag_{tag_num:02} {tag_key:24} "
+                      f"\t{tag_value} line: {line_str:40} "
+                      f"len:{len(line_str):02} chars")
+        tag_dict['transferSyntaxUid'] = dicom_tools.normalize_transfer_syntax(
+            tag_dict['transferSyntaxUid'])
+        for parsed_val in tag_dict.values():
+            parsed_file_list.append(parsed_val)
+    return parsed_file_list
+
+
+def parse_xml_dump_chunks(xml_chunks, this_file: str,
+                          date_window=None) -> list:
+    """Extracts desired tag values from a dcm2xml dump, streamed in chunks."""
+    # returns None when study is outside date window (remainder not read)
+    elements = dicom_tools.build_xml_tag_dict(this_file)
+    tag_dict = dicom_tools.parse_xml_tag_dump(xml_chunks, elements,
+                                              date_window)
+    if tag_dict is None:
+        return None
+    tag_dict['filename'] = os.path.split(this_file)[-1]
+    if config.DEBUG:
+        for tag_key, tag_value in tag_dict.items():
+            print(f"{tag_key:24} \t{elements[tag_key]} value: {tag_value}")
+    return list(tag_dict.values())
+
+
+def get_read_limits(args: argparse.Namespace = None) -> dict:
+    """Guarded read limits per file: config defaults or CLI overrides."""
+    read_limits = {'sniff_bytes': config.SNIFF_BYTES,
+                   'max_line_bytes': config.MAX_LINE_BYTES,
+                   'max_file_bytes': config.MAX_FILE_BYTES,
+                   'max_file_seconds': config.MAX_FILE_SECONDS}
+    for key in read_limits:
+        if getattr(args, key, None) is not None:
+            read_limits[key] = getattr(args, key)
+    read_limits['date_window'] = get_date_window(args)
+    return read_limits
+
+
+def get_date_arg(date_str: str) -> str:
+    """argparse type: valid calendar date as 'yyyyMMdd', '' if not given."""
+    date_arg = transfer_store.sanitize_date(date_str)
+    if date_arg:
+        try:
+            time.strptime(date_arg, '%Y%m%d')
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"invalid date: '{date_str}' (expected YYYYMMDD)")
+    return date_arg
+
+
+def get_date_window(args: argparse.Namespace = None):
+    """Returns ('yyyyMMdd' since, 'yyyyMMdd' until), '' when not filtered."""
+    since = transfer_store.sanitize_date(getattr(args, 'since', ''))
+    until = transfer_store.sanitize_date(getattr(args, 'until', ''))
+    if since or until:
+        return since or '00000000', until or '99999999'
+    return ''
+
+
+def get_min_mtime(date_window) -> float:
+    """Oldest file mtime that may hold a study on/after window 'since'."""
+    # a dump is written after its study: mtime < since -> study date < since
+    # ('until' can not be pushed down, old studies are often re-sent)
+    if not date_window or date_window[0] == '00000000':
+        return None
+    since_time = time.mktime(time.strptime(date_window[0], '%Y%m%d'))
+    return since_time - 24 * 60 * 60  # margin: modality/router time zones
+
+
+def read_dump_lines(lines_iter, dump_format: str, date_window) -> tuple:
+    """Reads dump lines, stops early once StudyDate/ContentDate is outside."""
+    # returns (lines_list, is_in_window)
+    lines_list = []
+    date_tags = list(dicom_tools.DATE_TAGS[dump_format]) if date_window \
+        else []
+    for line_str in lines_iter:
+        lines_list.append(line_str)
+        date_tag = next((tag for tag in date_tags if tag in line_str), None)
+        if date_tag is None:
+            continue
+        # StudyDate decides, ContentDate only when StudyDate is blank
+        date_tags = date_tags[date_tags.index(date_tag) + 1:]
+        date_str = parse_line_value(line_str, dump_format == 'fuji',
+                                    dump_format == 'dcmtk')
+        if date_str:
+            if not dicom_tools.is_date_in_window(date_str, date_window):
+                return lines_list, False
+            date_tags = []
+    return lines_list, True
+
+
+def parse_dump_stream(binary_handle, this_file: str,
+                      read_limits: dict = None) -> tuple:
+    """Guarded extraction: sniff leading bytes, then capped and timed read."""
+    # returns (parsed_file_list, quarantine reason or '')
+    if read_limits is None:
+        read_limits = get_read_limits()
+    max_file_bytes = read_limits['max_file_bytes']
+    max_seconds = read_limits['max_file_seconds']
+    date_window = read_limits.get('date_window', '')
+    try:
+        sample = file_tools.read_file_sample(binary_handle,
+                                             read_limits['sniff_bytes'])
+        encoding = file_tools.detect_bom_encoding(sample)
+        dump_format = dicom_tools.sniff_dump_format(
+            sample.decode(encoding, errors='replace'))
+        if not dump_format:
+            return [], f"not a tag dump: first {len(sample)} bytes"
+        if dump_format == 'xml':
+            parsed_file_list = parse_xml_dump_chunks(
+                file_tools.iter_guarded_chunks(binary_handle, max_file_bytes,
+                                               max_seconds, head=sample),
+                this_file, date_window)
+            if parsed_file_list is None:
+                return [], OUT_OF_WINDOW
+        else:
+            lines_list, is_in_window = read_dump_lines(
+                file_tools.iter_guarded_lines(
+                    binary_handle, encoding, read_limits['max_line_bytes'],
+                    max_file_bytes, max_seconds, head=sample),
+                dump_format, date_window)
+            if not is_in_window:
+                return [], OUT_OF_WINDOW
+            parsed_file_list = parse_tag_dump_lines(lines_list, this_file)
+        if binary_handle.tell() >= max_file_bytes:
+            return parsed_file_list, \
+                f"truncated: read cap " \
+                f"{file_tools.bytes_to_readable(max_file_bytes)}"
+    except TimeoutError as exp:
+        return [], f"timeout: {exp}"
+    except (OSError, LookupError, ElementTree.ParseError) as exp:
+        return [], f"{type(exp).__name__}: {exp}"
+    return parsed_file_list, ''
+
+
+def iter_dump_files(input_path: pathlib.Path, exclude_dirs=None,
+                    min_mtime: float = None, recursive: bool = True):
+    """Text dumps plus dcm2xml dumps that have no '.txt' dump sibling."""
+    # per-directory sorted walk: 'stem.txt' is always found before 'stem.xml'
+    txt_stems = set()
+    for this_file in file_tools.iter_files(input_path, ('.txt', '.xml'),
+                                           recursive, exclude_dirs,
+                                           sort=True, min_mtime=min_mtime):
+        stem_path = this_file.with_suffix('')
+        if this_file.suffix == '.txt':
+            txt_stems.add(stem_path)
+            yield this_file
+        elif stem_path not in txt_stems:
+            yield this_file
+
+
+def parse_dicom_tag_dump(input_headers: list, input_path: pathlib.Path,
+                         exclude_dirs=None, read_limits: dict = None,
+                         quarantine_list: list = None,
+                         prefetch_depth: int = config.PREFETCH_DEPTH,
+                         recursive: bool = True) -> list:
+    """Parse DICOM desired tag data from input .txt/.xml files."""
     def_name = inspect.currentframe().f_code.co_name
     status_str = f"{def_name}() in: '{os.sep.join(input_path.parts[-3:])}'"
     print(status_str)
-    file_path_list = file_tools.get_files(input_path, '.txt')
     file_count = 0
     dump_count = 0
+    skip_count = 0
     output_tag_list = [input_headers]  # first row contains headers
-    if not file_path_list:
+    if read_limits is None:
+        read_limits = get_read_limits()
+    min_mtime = get_min_mtime(read_limits['date_window'])
+    dump_files = (this_file for this_file in
+                  iter_dump_files(input_path, exclude_dirs, min_mtime,
+                                  recursive)
+                  if 'tagdump' not in str(this_file))
+    # files are parsed as the directory walk finds them, while worker
+    # threads keep reading the heads of the next files (network shares)
+    head_bytes = min(config.PREFETCH_BYTES, read_limits['max_file_bytes'])
+    for this_file, read_file_handle in prefetch_tools.iter_prefetched(
+            dump_files, head_bytes, prefetch_depth):
+        file_count += 1
+        print(f"   reading_{file_count:03}: {str(this_file)}")
+        with read_file_handle:
+            parsed_file_list, reason = parse_dump_stream(
+                read_file_handle, str(this_file), read_limits)
+        if reason == OUT_OF_WINDOW:
+            skip_count += 1
+        elif reason:
+            print(f"   quarantine: {reason}")
+            if quarantine_list is not None:
+                quarantine_list.append([str(this_file), reason])
+        if parsed_file_list:
+            dump_count += 1
+            output_tag_list.append(parsed_file_list)
+    if file_count == 0:
         error_msg = f"~!ERROR!~ missing files, check path: \n{input_path}"
         print(error_msg)
     else:
-        print(f"parsing: ({len(file_path_list)}) '.txt' files")
-        for this_file in file_path_list:
-            file_count += 1
-            parsed_file_list = []
-            read_file_handle = open(this_file, 'r')
-            if 'tagdump' not in str(this_file):
-                print(f"   reading_{file_count:03}: {str(this_file)}")
-                lines_list = read_file_handle.readlines()
-                # dynamically determine which input file format:
-                (is_fuji, is_dcmtk) = is_fuji_tag_dump(lines_list[0:5])
-                if is_fuji:
-                    elements = dicom_tools.build_fuji_tag_dict(this_file)
-                elif is_dcmtk:
-                    elements = dicom_tools.build_dcmtk_tag_dict(this_file)
-                else:
-                    elements = None  # input '.txt' not a tag dump
-                if elements:
-                    # re-initializes output dict for each file to blank values
-                    tag_dict = OrderedDict([(hdr, '')
-                                            for hdr in list(elements.keys())])
-                    tag_dict['filename'] = os.path.split(this_file)[-1]
-                    # using values: tag '(0008,0050)' or '0008 0050'
-                    tag_indices = get_tag_indices(list(elements.values()),
-                                                  lines_list)
-                    tag_num = 0
-                    dump_count += 1
-                    for tag_key, tag_value in elements.items():
-                        tag_num += 1
-                        line_str = tag_indices[tag_value]
-                        if len(tag_indices) > 0:
-                            if is_dcmtk:
-                                # parse value between square brackets [..]
-                                if '[' in line_str:
-                                    target_value = \
-                                        line_str.split('[', 1)[1].split(']')[0]
-                                    tag_dict[tag_key] = target_value
-                                elif '=' in line_str:
-                                    target_value = \
-                                        line_str.split('=', 1)[1].split('#')[0]
-                                    tag_dict[tag_key] = target_value.strip()
-                            elif is_fuji:
-                                # parse value between double quotes "..."
-                                if '"' in line_str:
-                                    target_value = \
-                                        line_str.split('"', 1)[1].split('"')[0]
-                                    tag_dict[tag_key] = target_value
-                        if config.DEBUG:
-                            print(f"tag_{tag_num:02} {tag_key:24} "
-                                  f"\t{tag_value} line: {line_str:40} "
-                                  f"len:{len(line_str):02} chars")
-                    for parsed_val in tag_dict.values():
-                        parsed_file_list.append(parsed_val)
-                    output_tag_list.append(parsed_file_list)
-            read_file_handle.close()
         print(
             f"extraction: {dump_count} dumps of "
-            f"{file_count} '.txt' files")
+            f"{file_count} '.txt/.xml' files")
+    if skip_count:
+        print(f"date window: {skip_count} dumps skipped")
+    return output_tag_list
+
+
+def parse_dicom_tag_archive(archive_path: pathlib.Path,
+                            read_limits: dict = None) -> tuple:
+    """Parse DICOM tag dumps streamed from a single archive (no extract)."""
+    member_count = 0
+    skip_count = 0
+    # keyed by member path without extension: '.txt' dump preferred
+    archive_tag_dict = OrderedDict()
+    quarantine_list = []
+    min_mtime = get_min_mtime((read_limits or {}).get('date_window'))
+    try:
+        for member_name, member_handle in archive_tools.iter_archive_members(
+                archive_path, ('.txt', '.xml'), is_binary=True,
+                min_mtime=min_mtime):
+            member_count += 1
+            stem_key, member_ext = member_name.rsplit('.', 1)
+            if 'tagdump' in member_name:
+                continue
+            if member_ext == 'xml' and stem_key in archive_tag_dict:
+                continue
+            parsed_file_list, reason = parse_dump_stream(
+                member_handle, member_name, read_limits)
+            if reason == OUT_OF_WINDOW:
+                skip_count += 1
+            elif reason:
+                quarantine_list.append([f"{archive_path}/{member_name}",
+                                        reason])
+            if parsed_file_list:
+                archive_tag_dict[stem_key] = parsed_file_list
+        status_str = f"{member_count} '.txt/.xml' members"
+        if skip_count:
+            status_str += f" ({skip_count} outside date window)"
+    except (OSError, EOFError, ImportError, ValueError,
+            tarfile.TarError, zipfile.BadZipFile, zlib.error) as exp:
+        status_str = f"~!ERROR!~ {sys.exc_info()[0]}\n{exp}"
+    return list(archive_tag_dict.values()), status_str, quarantine_list
+
+
+def parse_dicom_tag_archives(input_headers: list, archive_paths: list,
+                             max_workers: int = None,
+                             read_limits: dict = None,
+                             quarantine_list: list = None) -> list:
+    """Parse multiple tag dump archives in parallel worker processes."""
+    def_name = inspect.currentframe().f_code.co_name
+    output_tag_list = [input_headers]  # first row contains headers
+    print(f"{def_name}() parsing: ({len(archive_paths)}) archives")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # map() preserves input order, keeping output rows deterministic
+        results = executor.map(functools.partial(parse_dicom_tag_archive,
+                                                 read_limits=read_limits),
+                               archive_paths)
+        for archive_path, (archive_tag_list, status_str, quarantined) in \
+                zip(archive_paths, results):
+            print(f"   archive: {archive_path.name} "
+                  f"{len(archive_tag_list)} dumps of {status_str}")
+            output_tag_list.extend(archive_tag_list)
+            if quarantine_list is not None:
+                quarantine_list.extend(quarantined)
     return output_tag_list
 
 
-def get_cmd_args() -> pathlib.Path:
+def parse_dicom_tag_budget(input_headers: list, input_dirs: list,
+                           archive_paths: list, output_path: pathlib.Path,
+                           args: argparse.Namespace, read_limits: dict = None,
+                           quarantine_list: list = None) -> tuple:
+    """Parses study folders/archives by priority until time budget is spent."""
+    # returns (tag list incl. rows of earlier runs, coverage summary list)
+    def_name = inspect.currentframe().f_code.co_name
+    start_time = time.perf_counter()
+    state_path = pathlib.Path(
+        output_path, f"{config.TEMP_TAG}dicom_tag_scan_state.txt")
+    rows_path = pathlib.Path(
+        output_path, f"{config.TEMP_TAG}dicom_tag_scan_rows.csv")
+    input_paths = input_dirs + archive_paths
+    done_keys = scan_budget.load_scan_state(state_path, input_paths)
+    if not done_keys:
+        scan_budget.reset_scan_state(state_path, rows_path, input_paths)
+    scan_heap, skip_count = scan_budget.build_scan_heap(
+        scan_budget.iter_scan_items(input_dirs, archive_paths,
+                                    args.exclude_aets),
+        args.priority_aets, done_keys)
+    previous_rows = scan_budget.load_scan_rows(rows_path)
+    print(f"{def_name}() budget: {args.max_seconds:0.1f} seconds, "
+          f"{len(scan_heap)} items remaining, {skip_count} done earlier")
+    output_tag_list = [input_headers] + previous_rows
+    item_count = 0
+    dump_count = 0
+    for _, _, item_key, item_path, is_recursive in \
+            scan_budget.iter_budget_items(scan_heap, args.max_seconds,
+                                          start_time):
+        if archive_tools.is_archive(item_path):
+            item_tag_list, status_str, quarantined = \
+                parse_dicom_tag_archive(item_path, read_limits)
+            print(f"   archive: {item_path.name} "
+                  f"{len(item_tag_list)} dumps of {status_str}")
+            if quarantine_list is not None:
+                quarantine_list.extend(quarantined)
+        else:
+            item_tag_list = parse_dicom_tag_dump(
+                input_headers, item_path, args.exclude_aets, read_limits,
+                quarantine_list, args.prefetch, is_recursive)[1:]
+        # persisted per item: a stopped run still leaves a valid remainder
+        file_tools.save_output_csv(rows_path,
+                                   [input_headers] + item_tag_list)
+        scan_budget.save_scan_state(state_path, item_key)
+        output_tag_list.extend(item_tag_list)
+        item_count += 1
+        dump_count += len(item_tag_list)
+    if not scan_heap:  # scan complete: next run starts over
+        os.remove(str(state_path))
+        if rows_path.is_file():
+            os.remove(str(rows_path))
+    coverage_list = scan_budget.build_coverage_list(
+        [item_count, dump_count], [skip_count, len(previous_rows)],
+        [len(scan_heap), ''])
+    return output_tag_list, coverage_list
+
+
+def parse_dicom_tag_shard(input_headers: list, input_dirs: list,
+                          archive_paths: list, output_path: pathlib.Path,
+                          args: argparse.Namespace,
+                          read_limits: dict = None) -> dict:
+    """Parses the study folders/archives hashed to one shard of N."""
+    # writes partial rows with single run order keys, then a manifest
+    def_name = inspect.currentframe().f_code.co_name
+    shard_num, shard_count = args.shard
+    filename_idx = input_headers.index('filename')
+    order_rows = []
+    quarantine_rows = []
+    item_count = 0
+    for shard_key, order_prefix, item_path, is_recursive in \
+            shard_tools.iter_shard_items(input_dirs, archive_paths,
+                                         args.exclude_aets):
+        if shard_tools.get_shard(shard_key, shard_count) != shard_num:
+            continue
+        item_count += 1
+        quarantined = []
+        if archive_tools.is_archive(item_path):
+            item_tag_list, status_str, quarantined = \
+                parse_dicom_tag_archive(item_path, read_limits)
+            print(f"   archive: {item_path.name} "
+                  f"{len(item_tag_list)} dumps of {status_str}")
+        else:
+            item_tag_list = parse_dicom_tag_dump(
+                input_headers, item_path, args.exclude_aets, read_limits,
+                quarantined, args.prefetch, is_recursive)[1:]
+        phase, item_num, folder_name = order_prefix
+        # loose dumps: ordered by filename among the study folders
+        is_loose = phase == 0 and not is_recursive
+        order_rows.extend(
+            ([phase, item_num, row[filename_idx] if is_loose
+              else folder_name, seq], row)
+            for seq, row in enumerate(item_tag_list))
+        quarantine_rows.extend(
+            [[phase, item_num, os.path.basename(file_name) if is_loose
+              else folder_name, seq], file_name, reason]
+            for seq, (file_name, reason) in enumerate(quarantined))
+    partial_path, manifest_path = shard_tools.get_shard_paths(
+        output_path, shard_num, shard_count, config.TEMP_TAG)
+    manifest = shard_tools.write_shard(
+        partial_path, manifest_path, input_headers, order_rows,
+        quarantine_rows,
+        {'shard': shard_num, 'shards': shard_count,
+         'inputs': [p.name for p in input_dirs + archive_paths],
+         'date_window': read_limits['date_window'],
+         'exclude_aets': args.exclude_aets, 'items': item_count})
+    print(f"{def_name}() shard {shard_num}/{shard_count}: "
+          f"{item_count} items, {manifest['rows']} dumps, "
+          f"{len(quarantine_rows)} quarantined '{partial_path}'")
+    return manifest
+
+
+def iter_sample_items(input_dirs: list, pack_paths: list, exclude_dirs=None,
+                      min_mtime: float = None):
+    """Yields (stratum, (source, dump key)) of each discovered dump."""
+    # discovery only: directory walk and pack index, no dump is read
+    for input_path in input_dirs:
+        for this_file in iter_dump_files(input_path, exclude_dirs, min_mtime):
+            if 'tagdump' in str(this_file):
+                continue
+            rel_parts = this_file.relative_to(input_path.absolute()).parts
+            yield sample_tools.get_stratum(rel_parts), (input_path,
+                                                        str(this_file))
+    for pack_path in pack_paths:
+        with dump_pack.DumpPack(pack_path) as pack:
+            names = [name for name in pack if 'tagdump' not in name and
+                     name.endswith(('.txt', '.xml'))]
+        txt_stems = set(name[:-4] for name in names if name.endswith('.txt'))
+        for name in names:
+            if name.endswith('.xml') and name[:-4] in txt_stems:
+                continue  # '.txt' dump preferred, as in directories
+            yield sample_tools.get_stratum(tuple(name.split('/'))), \
+                (pack_path, name)
+
+
+def parse_sampled_dumps(sampled_items: list, read_limits: dict,
+                        prefetch_depth: int = config.PREFETCH_DEPTH) -> dict:
+    """Parses sampled dumps only: {(source, dump key): row or []}."""
+    sampled_rows = OrderedDict((item, []) for item in sampled_items)
+    file_items = [item for item in sampled_items
+                  if not archive_tools.is_archive(item[0])]
+    head_bytes = min(config.PREFETCH_BYTES, read_limits['max_file_bytes'])
+    for file_item, (this_file, read_file_handle) in zip(
+            file_items, prefetch_tools.iter_prefetched(
+                [pathlib.Path(key) for _, key in file_items], head_bytes,
+                prefetch_depth)):
+        with read_file_handle:
+            sampled_rows[file_item], _ = parse_dump_stream(
+                read_file_handle, str(this_file), read_limits)
+    pack_items = [item for item in sampled_items
+                  if archive_tools.is_archive(item[0])]
+    for pack_path, items in itertools.groupby(pack_items,
+                                              key=lambda item: item[0]):
+        with dump_pack.DumpPack(pack_path) as pack:
+            for pack_item in items:  # random access: one frame per dump
+                sampled_rows[pack_item], _ = parse_dump_stream(
+                    io.BytesIO(pack.read(pack_item[1])), pack_item[1],
+                    read_limits)
+    return sampled_rows
+
+
+def parse_dicom_tag_sample(input_headers: list, input_dirs: list,
+                           archive_paths: list, args: argparse.Namespace,
+                           read_limits: dict) -> tuple:
+    """Parses a random sample of dumps, estimates repository-wide counts."""
+    # returns (tag list of sampled dumps, estimate list)
+    def_name = inspect.currentframe().f_code.co_name
+    pack_paths = [p for p in archive_paths
+                  if p.suffix.lower() == dump_pack.PACK_EXT]
+    for archive_path in archive_paths:
+        if archive_path not in pack_paths:
+            print(f"   sample: skipped '{archive_path.name}' "
+                  f"(only '{dump_pack.PACK_EXT}' packs have random access)")
+    strata = sample_tools.sample_items(
+        iter_sample_items(input_dirs, pack_paths, args.exclude_aets,
+                          get_min_mtime(read_limits['date_window'])),
+        args.sample, args.sample_by, args.seed)
+    # sorted per source: sequential reads in directory/pack order
+    sampled_items = sorted(item for _, items in strata.values()
+                           for item in items)
+    population = sum(count for count, _ in strata.values())
+    print(f"{def_name}() sampling: {len(sampled_items)} of {population} "
+          f"dumps in {len(strata)} strata ({args.sample_by})")
+    sampled_rows = parse_sampled_dumps(sampled_items, read_limits,
+                                       args.prefetch)
+    strata_rows = {stratum: (count, [sampled_rows[item] for item in items])
+                   for stratum, (count, items) in strata.items()}
+    output_tag_list = [input_headers] + [row for row in sampled_rows.values()
+                                         if row]
+    estimate_list = sample_tools.estimate_counts(strata_rows, input_headers)
+    return output_tag_list, estimate_list
+
+
+def print_tag_list(tag_list: list) -> None:
+    """Display rows (first row contains headers) as aligned columns."""
+    if tag_list:
+        col_widths = [max(len(str(row[col])) for row in tag_list)
+                      for col in range(len(tag_list[0]))]
+        for row in tag_list:
+            print('  '.join(f"{str(val):{width}}"
+                            for val, width in zip(row, col_widths)))
+    print(f"({max(len(tag_list) - 1, 0)} rows)")
+
+
+def run_query(args: argparse.Namespace) -> list:
+    """Answers range/query/pivot lookups from the indexed transfer store."""
+    conn = transfer_store.open_store(args.store)
+    try:
+        if args.type == 'range':
+            result_list = transfer_store.query_range(conn, args.since,
+                                                     args.until)
+        elif args.type == 'pivot':
+            result_list = transfer_store.pivot_transfers(conn, args.rows,
+                                                         args.cols)
+        else:
+            result_list = transfer_store.query_transfers(conn, args.column,
+                                                         args.value,
+                                                         args.like)
+    finally:
+        conn.close()
+    print_tag_list(result_list)
+    return result_list
+
+
+def run_listen(args: argparse.Namespace) -> None:
+    """Receives DICOMs via C-STORE, streaming rows to CSV/SQLite sinks."""
+    def_name = inspect.currentframe().f_code.co_name
+    forward_addr = None
+    if args.forward:
+        forward_addr = store_scp.parse_forward_addr(args.forward)
+    server, row_queue, writer = store_scp.start_store_scp(
+        args.ae_title, args.port, args.address, args.csv, args.store,
+        forward_addr)
+    print(f"{def_name}() '{args.ae_title}' listening on "
+          f"{args.address or '*'}:{server.server_address[1]} "
+          f"(ctrl+c to stop)")
+    try:
+        while writer.is_alive():
+            writer.join(timeout=1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store_scp.stop_store_scp(server, row_queue, writer)
+
+
+def run_dump(args: argparse.Namespace) -> None:
+    """Writes JSON/XML dumps of largest .dcm per study in worker processes."""
+    def_name = inspect.currentframe().f_code.co_name
+    study_dicoms = list(dump_emitter.iter_study_dicoms(args.input,
+                                                       args.exclude_aets))
+    print(f"{def_name}() dumping: ({len(study_dicoms)}) studies "
+          f"'{args.output}'")
+    dcm_paths = [dcm_path for _, dcm_path in study_dicoms]
+    output_dirs = [pathlib.Path(args.output, study_path.name)
+                   for study_path, _ in study_dicoms]
+    error_count = 0
+    pack = None
+    if args.pack is not None:
+        pack = dump_pack.DumpPack(args.pack, 'a')
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            # each .dcm is read once (pixel data skipped) for all formats
+            if pack is None:
+                results = executor.map(functools.partial(
+                    dump_emitter.emit_dicom_dumps,
+                    dump_formats=args.formats), dcm_paths, output_dirs)
+            else:
+                results = executor.map(functools.partial(
+                    dump_emitter.render_dicom_dumps,
+                    dump_formats=args.formats), dcm_paths)
+            for dcm_path, output_dir, result in zip(dcm_paths, output_dirs,
+                                                    results):
+                if pack is not None:
+                    # single writer: frames appended in study order
+                    dump_dict, sop_instance_uid, status_str = result
+                    for dump_ext, dump_str in dump_dict.items():
+                        pack.append(f"{output_dir.name}/{dcm_path.stem}"
+                                    f"{dump_ext}", dump_str.encode('utf-8'),
+                                    sop_instance_uid)
+                    status_str = status_str or ', '.join(dump_dict)
+                else:
+                    status_str = result
+                print(f"   {dcm_path.parent.name}/{dcm_path.name}: "
+                      f"{status_str}")
+                if status_str.startswith('~!ERROR!~'):
+                    error_count += 1
+    finally:
+        if pack is not None:
+            pack.close()
+    print(f"dumped: {len(dcm_paths) - error_count} of "
+          f"{len(dcm_paths)} studies")
+
+
+def run_pack(args: argparse.Namespace) -> None:
+    """Appends existing '.txt'/'.xml' dumps of a directory into a pack."""
+    def_name = inspect.currentframe().f_code.co_name
+    pack_count = 0
+    file_count = 0
+    skip_count = 0
+    with dump_pack.DumpPack(args.output, 'a') as pack:
+        for this_file in file_tools.iter_files(
+                args.input, ('.txt', '.xml'),
+                exclude_dirs=args.exclude_aets, sort=True):
+            file_count += 1
+            name = this_file.relative_to(args.input.absolute()).as_posix()
+            if name in pack:
+                continue  # append-only: packed dumps are never rewritten
+            try:
+                with open(str(this_file), 'rb') as dump_file:
+                    sample = file_tools.read_file_sample(dump_file,
+                                                         config.SNIFF_BYTES)
+                    encoding = file_tools.detect_bom_encoding(sample)
+                    dump_format = dicom_tools.sniff_dump_format(
+                        sample.decode(encoding, errors='replace'))
+                    if not dump_format:  # stray '.txt' logs/notes
+                        skip_count += 1
+                        continue
+                    dump_bytes = sample + dump_file.read()
+                # indexed by SOPInstanceUID too, found in the dump header
+                sop_instance_uid = dicom_tools.get_dump_sop_uid(
+                    dump_bytes[:config.PREFETCH_BYTES].decode(
+                        encoding, errors='replace'), dump_format)
+                pack.append(name, dump_bytes, sop_instance_uid,
+                            mtime=this_file.stat().st_mtime)
+                pack_count += 1
+            except (OSError, LookupError) as exp:
+                print(f"   ~!ERROR!~ {type(exp).__name__}: {exp}")
+        print(f"{def_name}() packed: {pack_count} of {file_count} files, "
+              f"{len(pack)} total '{args.output}'")
+        if skip_count:
+            print(f"   skipped: {skip_count} files that are not tag dumps")
+
+
+def run_diff(args: argparse.Namespace) -> None:
+    """Diffs two result sets: delta rows and per-AET/station volume CSVs."""
+    def_name = inspect.currentframe().f_code.co_name
+    os.makedirs(str(args.output), exist_ok=True)
+    rows_path = pathlib.Path(args.output,
+                             f"{config.TEMP_TAG}dicom_tag_diff_rows.csv")
+    volume_path = pathlib.Path(args.output,
+                               f"{config.TEMP_TAG}dicom_tag_diff_volume.csv")
+    print(f"{def_name}() diffing: '{args.old}' -> '{args.new}'")
+    try:
+        status_counts, volume_list = diff_tools.diff_results(
+            args.old, args.new, rows_path, args.chunk_rows)
+    except (OSError, ValueError, sqlite3.Error) as exp:
+        print(f"~!ERROR!~ {type(exp).__name__}: {exp}")
+        return
+    file_tools.save_output_csv(volume_path, volume_list, append=False)
+    print(f"diff: {status_counts['new']} new, {status_counts['missing']} "
+          f"missing, {status_counts['changed']} changed '{rows_path}'")
+    for col, value, old_count, new_count, delta in volume_list[1:11]:
+        print(f"   {col} '{value}': {old_count} -> {new_count} ({delta:+})")
+    print(f"volume: {len(volume_list) - 1} changed values '{volume_path}'")
+
+
+def run_merge(args: argparse.Namespace) -> None:
+    """Merges shard partials into the report of a single node run."""
+    def_name = inspect.currentframe().f_code.co_name
+    manifest_paths = shard_tools.find_manifests(args.input)
+    print(f"{def_name}() merging: ({len(manifest_paths)}) shard manifests")
+    try:
+        all_tag_list, quarantine_list, manifests = \
+            shard_tools.merge_shards(manifest_paths)
+    except (OSError, KeyError, ValueError) as exp:
+        print(f"~!ERROR!~ {type(exp).__name__}: {exp}")
+        return
+    for manifest in manifests:
+        print(f"   shard {manifest['shard']}/{manifest['shards']}: "
+              f"{manifest['items']} items, {manifest['rows']} dumps, "
+              f"{len(manifest['quarantine'])} quarantined "
+              f"({manifest['host']} {manifest['created']})")
+    os.makedirs(str(args.output), exist_ok=True)
+    export_parse_results(args.output, all_tag_list, quarantine_list,
+                         args.store)
+
+
+def get_cmd_args() -> argparse.Namespace:
     """Command line input on directory to scan recursively for DICOM dumps."""
     def_name = inspect.currentframe().f_code.co_name
     parser = argparse.ArgumentParser()
-    parser.add_argument("-i", "--input", type=str, help="input path")
+    parser.add_argument("-i", "--input", type=str, nargs='+',
+                        help="input path(s): directory or archive "
+                             f"{'/'.join(archive_tools.ARCHIVE_EXTS)}")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="max worker processes for archive inputs")
+    parser.add_argument("-s", "--store", type=pathlib.Path, default=None,
+                        help="SQLite transfer store to load parsed rows")
+    parser.add_argument("-x", "--exclude_aets", type=str, nargs='*',
+                        default=None,
+                        help="skip folders named with these AET prefixes "
+                             "(no values: config.AET_PATTERN)")
+    parser.add_argument("--sniff_bytes", type=int, default=None,
+                        help="leading bytes sniffed to reject non-dumps")
+    parser.add_argument("--max_line_bytes", type=int, default=None,
+                        help="longer lines are truncated")
+    parser.add_argument("--max_file_bytes", type=int, default=None,
+                        help="max bytes read per file")
+    parser.add_argument("--max_file_seconds", type=float, default=None,
+                        help="per-file time budget, then quarantined")
+    parser.add_argument("--prefetch", type=int,
+                        default=config.PREFETCH_DEPTH,
+                        help="initial file reads in flight ahead of parser "
+                             "(adapts to latency, 0: no read-ahead)")
+    parser.add_argument("--max_seconds", "--max-seconds", type=float,
+                        default=None,
+                        help="time budget: priority-ordered partial report, "
+                             "next run resumes the remaining studies")
+    parser.add_argument("--priority_aets", type=str, nargs='+',
+                        default=None,
+                        help="budget: folders of these AET prefixes first "
+                             "(then newest first)")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="estimate counts from N randomly sampled dumps "
+                             "(per folder with --sample_by folder)")
+    parser.add_argument("--sample_by", choices=sample_tools.SAMPLE_MODES,
+                        default='reservoir',
+                        help="sample: one reservoir or per top level folder")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="sample: random seed for a repeatable sample")
+    parser.add_argument("--shard", type=shard_tools.parse_shard_arg,
+                        default=None,
+                        help="'i/N': parse study folders hashed to shard i "
+                             "of N, partial rows + manifest for 'merge'")
+    parser.add_argument("--since", type=get_date_arg, default='',
+                        help="skip studies before StudyDate (YYYYMMDD)")
+    parser.add_argument("--until", type=get_date_arg, default='',
+                        help="skip studies after StudyDate (YYYYMMDD)")
+    subparsers = parser.add_subparsers(dest='command')
+    query_parser = subparsers.add_parser(
+        'query', help="lookups/pivots from SQLite transfer store")
+    query_parser.add_argument("-s", "--store", type=pathlib.Path,
+                              required=True, help="SQLite transfer store")
+    query_parser.add_argument("-t", "--type", default='query',
+                              choices=['range', 'query', 'pivot'],
+                              help="range: studyDate window, query: "
+                                   "column lookup, pivot: count table")
+    query_parser.add_argument("-c", "--column", default='accessionNumber',
+                              choices=dicom_tools.HEADERS,
+                              help="query: column to match")
+    query_parser.add_argument("-v", "--value", default='',
+                              help="query: value to match")
+    query_parser.add_argument("--like", action='store_true',
+                              help="query: SQL LIKE match ('%%' wildcard)")
+    query_parser.add_argument("--since", type=get_date_arg, default='',
+                              help="range: first studyDate (YYYYMMDD)")
+    query_parser.add_argument("--until", type=get_date_arg, default='',
+                              help="range: last studyDate (YYYYMMDD)")
+    query_parser.add_argument("--rows", choices=dicom_tools.HEADERS,
+                              default='sourceApplicationEntityTitle',
+                              help="pivot: row key")
+    query_parser.add_argument("--cols", choices=dicom_tools.HEADERS,
+                              default='modality', help="pivot: column key")
+    listen_parser = subparsers.add_parser(
+        'listen', help="C-STORE SCP: extract rows from received DICOMs")
+    listen_parser.add_argument("-a", "--ae_title", default='IMG_RTR_RPT',
+                               help="SCP application entity title")
+    listen_parser.add_argument("-p", "--port", type=int, default=11112,
+                               help="SCP listen port")
+    listen_parser.add_argument("--address", default='',
+                               help="SCP listen address (default: all)")
+    listen_parser.add_argument("--csv", type=pathlib.Path, default=None,
+                               help="sink: append rows to .csv file")
+    listen_parser.add_argument("-s", "--store", type=pathlib.Path,
+                               default=None,
+                               help="sink: SQLite transfer store")
+    listen_parser.add_argument("--forward", default=None,
+                               help="forward datasets to 'AET@host:port' "
+                                    "(default: discard)")
+    dump_parser = subparsers.add_parser(
+        'dump', help="JSON/XML dumps of largest .dcm per study folder")
+    dump_parser.add_argument("-i", "--input", type=pathlib.Path,
+                             required=True,
+                             help="source directory of study sub-folders")
+    dump_parser.add_argument("-o", "--output", type=pathlib.Path,
+                             default=pathlib.Path(PARENT_PATH, 'output',
+                                                  'dicom_dumps'),
+                             help="destination directory of dumps")
+    dump_parser.add_argument("-f", "--formats", nargs='+',
+                             choices=dump_emitter.DUMP_FORMATS,
+                             default=list(dump_emitter.DUMP_FORMATS),
+                             help="DICOM JSON (PS3.18) and/or dcm2xml XML")
+    dump_parser.add_argument("-w", "--workers", type=int, default=None,
+                             help="max worker processes")
+    dump_parser.add_argument("--pack", type=pathlib.Path, default=None,
+                             help=f"append dumps to a '{dump_pack.PACK_EXT}' "
+                                  f"pack instead of one file per dump")
+    dump_parser.add_argument("-x", "--exclude_aets", type=str, nargs='*',
+                             default=None,
+                             help="skip folders named with these AET "
+                                  "prefixes (no values: config.AET_PATTERN)")
+    pack_parser = subparsers.add_parser(
+        'pack', help=f"append '.txt/.xml' dumps into a "
+                     f"'{dump_pack.PACK_EXT}' pack (input with -i)")
+    pack_parser.add_argument("-i", "--input", type=pathlib.Path,
+                             required=True,
+                             help="directory of '.txt/.xml' tag dumps")
+    pack_parser.add_argument("-o", "--output", type=pathlib.Path,
+                             required=True,
+                             help=f"'{dump_pack.PACK_EXT}' pack to append")
+    pack_parser.add_argument("-x", "--exclude_aets", type=str, nargs='*',
+                             default=None,
+                             help="skip folders named with these AET "
+                                  "prefixes (no values: config.AET_PATTERN)")
+    diff_parser = subparsers.add_parser(
+        'diff', help="new/missing/changed rows between two result sets "
+                     "(.xlsx report, .csv or SQLite store)")
+    diff_parser.add_argument("old", type=pathlib.Path,
+                             help="earlier result set")
+    diff_parser.add_argument("new", type=pathlib.Path,
+                             help="later result set")
+    diff_parser.add_argument("-o", "--output", type=pathlib.Path,
+                             default=pathlib.Path(PARENT_PATH, 'output'),
+                             help="destination directory of diff CSVs")
+    diff_parser.add_argument("--chunk_rows", type=int,
+                             default=diff_tools.SORT_CHUNK_ROWS,
+                             help="rows sorted in memory before spilling "
+                                  "a sorted run to disk")
+    merge_parser = subparsers.add_parser(
+        'merge', help="combine '--shard i/N' partials into the report")
+    merge_parser.add_argument("-i", "--input", type=pathlib.Path,
+                              nargs='+', required=True,
+                              help="shard manifests (.json) or directories "
+                                   "holding them")
+    merge_parser.add_argument("-o", "--output", type=pathlib.Path,
+                              default=pathlib.Path(PARENT_PATH, 'output'),
+                              help="destination directory of the report")
+    merge_parser.add_argument("-s", "--store", type=pathlib.Path,
+                              default=None,
+                              help="SQLite transfer store to load merged rows")
     args = parser.parse_args()
+    if args.command == 'merge':
+        for input_path in args.input:
+            if not input_path.exists():
+                parser.error(f"invalid path: '{input_path}'")
+        return args
+    if args.command == 'diff':
+        for input_path in (args.old, args.new):
+            if not input_path.is_file():
+                parser.error(f"invalid path: '{input_path}'")
+        if args.chunk_rows < 1:
+            parser.error("--chunk_rows must be positive")
+        return args
+    if args.command == 'pack':
+        if not args.input.is_dir():
+            parser.error(f"invalid path: '{args.input}'")
+        if args.exclude_aets == []:
+            args.exclude_aets = config.AET_PATTERN
+        return args
+    if args.command == 'dump':
+        if not args.input.is_dir():
+            parser.error(f"invalid path: '{args.input}'")
+        if args.exclude_aets == []:
+            args.exclude_aets = config.AET_PATTERN
+        return args
+    if args.command == 'listen':
+        if args.csv is None and args.store is None:
+            parser.error("listen requires a sink: --csv and/or --store")
+        return args
+    if args.since and args.until and args.since > args.until:
+        parser.error(f"--since {args.since} is after --until {args.until}")
+    if args.command == 'query':
+        if not args.store.is_file():
+            parser.error(f"invalid store: '{args.store}'")
+        return args
+    if args.sample is not None:
+        if args.sample < 1:
+            parser.error("--sample must be positive")
+        if args.max_seconds is not None or args.store is not None:
+            parser.error("--sample: estimates only, no --max_seconds/--store")
+    if args.shard is not None:
+        if args.sample is not None or args.max_seconds is not None or \
+                args.store is not None:
+            parser.error("--shard: no --sample/--max_seconds/--store "
+                         "(load the store with 'merge -s')")
+    if args.exclude_aets == []:
+        args.exclude_aets = config.AET_PATTERN
     if args.input is None:
         if config.DEMO_ENABLED:
-            input_path = pathlib.Path(PARENT_PATH, 'input', 'tag_dumps')
+            input_paths = [pathlib.Path(PARENT_PATH, 'input', 'tag_dumps')]
         else:
-            input_path = pathlib.Path(PARENT_PATH, 'tag_dumps_all')
+            input_paths = [pathlib.Path(PARENT_PATH, 'tag_dumps_all')]
     else:
-        input_path = pathlib.Path(args.input)
-        if input_path.exists() and input_path.is_dir():
-            print(f"{def_name}() dumping path:'{str(input_path)}'")
-        else:
-            parser.error(f"invalid path: '{input_path}'")
-            input_path = None
-    return input_path
+        input_paths = []
+        for input_str in args.input:
+            input_path = pathlib.Path(input_str)
+            if input_path.is_dir() or archive_tools.is_archive(input_path):
+                print(f"{def_name}() dumping path:'{str(input_path)}'")
+                input_paths.append(input_path)
+            else:
+                parser.error(f"invalid path: '{input_path}'")
+    args.input = input_paths
+    return args
 
 
-def main():
-    """Driver to read and parse DICOM tag data from text files."""
-    print(f"{SCRIPT_NAME} starting...")
-    start = time.perf_counter()
+def export_parse_results(output_path: pathlib.Path, all_tag_list: list,
+                         quarantine_list: list, store_path=None,
+                         filename: str = None) -> None:
+    """Saves quarantine list, loads store and exports rows to Excel."""
+    filename = filename or f"{config.TEMP_TAG}dicom_tag_dumps.xlsx"
+    if len(quarantine_list) > 1:
+        quarantine_path = pathlib.Path(
+            output_path, f"{config.TEMP_TAG}dicom_tag_quarantine.csv")
+        file_tools.save_output_csv(quarantine_path, quarantine_list,
+                                   append=False)
+        print(f"quarantine: {len(quarantine_list) - 1} files "
+              f"'{quarantine_path}'")
+    # works on both linux and windows
+    if len(all_tag_list) > 1:  # more than just headers
+        if store_path is not None:
+            conn = transfer_store.open_store(store_path)
+            try:
+                row_count = transfer_store.load_rows(conn, all_tag_list)
+                print(f"store: {row_count} rows loaded, "
+                      f"{transfer_store.count_rows(conn)} total "
+                      f"'{store_path}'")
+            finally:
+                conn.close()
+        xls_status = export_to_excel(output_path, filename, all_tag_list)
+        print(xls_status)
+
+
+def run_parse(args: argparse.Namespace) -> None:
+    """Parses input dumps/archives and exports rows to Excel (and store)."""
     config.print_header(SCRIPT_NAME)
-    input_path = get_cmd_args()
-    if input_path.exists():
+    input_dirs = [p for p in args.input if p.is_dir()]
+    archive_paths = [p for p in args.input if archive_tools.is_archive(p)]
+    read_limits = get_read_limits(args)
+    # an archive written before 'since' only holds studies before 'since'
+    min_mtime = get_min_mtime(read_limits['date_window'])
+    for input_path in input_dirs:
+        archive_paths.extend(file_tools.iter_files(
+            input_path, archive_tools.ARCHIVE_EXTS,
+            exclude_dirs=args.exclude_aets, sort=True, min_mtime=min_mtime))
+    if input_dirs or archive_paths:
         if config.DEMO_ENABLED:
             output_path = pathlib.Path(PARENT_PATH, 'output')
         else:
             output_path = pathlib.Path(PARENT_PATH, CURR_DIR, 'tag_dumps_all')
         if not output_path.exists():
             os.makedirs(str(output_path))
-        all_tag_list = parse_dicom_tag_dump(dicom_tools.HEADERS, input_path)
+        quarantine_list = [['filename', 'reason']]
+        all_tag_list = [dicom_tools.HEADERS]
+        coverage_list = []
+        estimate_list = []
         filename = f"{config.TEMP_TAG}dicom_tag_dumps.xlsx"
-        # works on both linux and windows
-        if len(all_tag_list) > 1:  # more than just headers
-            xls_status = export_to_excel(output_path, filename, all_tag_list)
-            print(xls_status)
+        if args.sample is not None:
+            all_tag_list, estimate_list = parse_dicom_tag_sample(
+                dicom_tools.HEADERS, input_dirs, archive_paths, args,
+                read_limits)
+            input_dirs, archive_paths = [], []
+            filename = f"{config.TEMP_TAG}dicom_tag_sample.xlsx"
+        if args.shard is not None:
+            parse_dicom_tag_shard(dicom_tools.HEADERS, input_dirs,
+                                  archive_paths, output_path, args,
+                                  read_limits)
+            input_dirs, archive_paths = [], []
+        if args.max_seconds is not None:
+            all_tag_list, coverage_list = parse_dicom_tag_budget(
+                dicom_tools.HEADERS, input_dirs, archive_paths, output_path,
+                args, read_limits, quarantine_list)
+            input_dirs, archive_paths = [], []
+        for input_path in input_dirs:
+            all_tag_list.extend(
+                parse_dicom_tag_dump(dicom_tools.HEADERS, input_path,
+                                     args.exclude_aets, read_limits,
+                                     quarantine_list, args.prefetch)[1:])
+        if archive_paths:
+            all_tag_list.extend(
+                parse_dicom_tag_archives(dicom_tools.HEADERS, archive_paths,
+                                         args.workers, read_limits,
+                                         quarantine_list)[1:])
+        if coverage_list:
+            coverage_path = pathlib.Path(
+                output_path, f"{config.TEMP_TAG}dicom_tag_coverage.csv")
+            file_tools.save_output_csv(coverage_path, coverage_list,
+                                       append=False)
+            for status, item_count, dump_count in coverage_list[1:]:
+                dump_str = f", {dump_count} dumps" if dump_count != '' else ''
+                print(f"coverage: {status:9} {item_count} items{dump_str}")
+        if estimate_list:
+            estimate_path = pathlib.Path(
+                output_path, f"{config.TEMP_TAG}dicom_tag_estimates.csv")
+            file_tools.save_output_csv(estimate_path, estimate_list,
+                                       append=False)
+            for col, value, sampled, estimate, low, high in \
+                    estimate_list[1:]:
+                print(f"estimate: {col} '{value}': {estimate} "
+                      f"(95% {low}-{high}, {sampled} sampled)")
+            print(f"estimates: '{estimate_path}'")
+        export_parse_results(output_path, all_tag_list, quarantine_list,
+                             args.store, filename)
+    else:
+        print(f"~!ERROR!~ invalid path: {args.input}")
+
+
+def main():
+    """Driver to read and parse DICOM tag data from text files."""
+    print(f"{SCRIPT_NAME} starting...")
+    start = time.perf_counter()
+    args = get_cmd_args()
+    if args.command == 'query':
+        run_query(args)
+    elif args.command == 'listen':
+        run_listen(args)
+    elif args.command == 'dump':
+        run_dump(args)
+    elif args.command == 'pack':
+        run_pack(args)
+    elif args.command == 'diff':
+        run_diff(args)
+    elif args.command == 'merge':
+        run_merge(args)
     else:
-        print(f"~!ERROR!~ invalid path: {input_path}")
+        run_parse(args)
     end = time.perf_counter() - start
     print(f"{SCRIPT_NAME} finished in {end:0.2f} seconds")
 
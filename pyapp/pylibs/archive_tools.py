@@ -0,0 +1,92 @@
+# -*- coding: UTF-8 -*-
+"""Archive utilities to stream tag dumps from .zip/.tar.gz/.tar.zst files."""
+import io
+import pathlib
+import tarfile
+import time
+import zipfile
+try:
+    import zstandard
+except ImportError:  # optional: only required for '.tar.zst' archives
+    zstandard = None
+from . import dump_pack
+
+__all__ = ['ARCHIVE_EXTS', 'get_archive_ext', 'is_archive',
+           'iter_text_lines', 'iter_archive_members']
+
+ARCHIVE_EXTS = ('.zip', '.tar.gz', '.tgz', '.tar.zst', dump_pack.PACK_EXT)
+
+
+def get_archive_ext(input_path: pathlib.Path) -> str:
+    """Returns supported archive extension of input path, else ''."""
+    name = str(input_path).lower()
+    return next((ext for ext in ARCHIVE_EXTS if name.endswith(ext)), '')
+
+
+def is_archive(input_path: pathlib.Path) -> bool:
+    """Returns true if input path is a file with a supported archive ext."""
+    if isinstance(input_path, pathlib.Path) and input_path.is_file():
+        return get_archive_ext(input_path) != ''
+    return False
+
+
+def iter_text_lines(binary_handle, encoding: str = 'utf-8'):
+    """Yields decoded lines from a (possibly non-seekable) binary stream."""
+    for line_bytes in binary_handle:
+        yield line_bytes.decode(encoding, errors='replace')
+
+
+def _as_binary(binary_handle):
+    """Returns member file object as is (caller reads bytes)."""
+    return binary_handle
+
+
+def _iter_tar_members(tar_handle: tarfile.TarFile, file_ext,
+                      min_mtime: float):
+    """Yields (name, binary file object) of each matching tar member."""
+    # stream mode 'r|*': each member must be consumed before the next one
+    for member in tar_handle:
+        if member.isfile() and member.name.endswith(file_ext) and \
+                member.mtime >= min_mtime:
+            yield member.name, tar_handle.extractfile(member)
+
+
+def iter_archive_members(input_path: pathlib.Path, file_ext='.txt',
+                         is_binary: bool = False, min_mtime: float = None):
+    """Yields (member_name, line iterator) without extracting to disk."""
+    # file_ext: str or tuple of str, is_binary: yield raw member file object
+    # min_mtime: skip members modified before (archived mtime metadata)
+    archive_ext = get_archive_ext(input_path)
+    min_mtime = min_mtime or 0.0
+    if is_binary:
+        as_member = _as_binary
+    else:
+        as_member = iter_text_lines
+    if archive_ext == '.zip':
+        with zipfile.ZipFile(str(input_path), 'r') as zip_handle:
+            for info in zip_handle.infolist():
+                if not info.is_dir() and info.filename.endswith(file_ext) \
+                        and time.mktime(info.date_time + (0, 0, -1)) >= \
+                        min_mtime:
+                    with zip_handle.open(info, 'r') as member:
+                        yield info.filename, as_member(member)
+    elif archive_ext in ('.tar.gz', '.tgz'):
+        with tarfile.open(str(input_path), mode='r|gz') as tar_handle:
+            for name, member in _iter_tar_members(tar_handle, file_ext,
+                                                  min_mtime):
+                yield name, as_member(member)
+    elif archive_ext == '.tar.zst':
+        if zstandard is None:
+            raise ImportError(f"'zstandard' package required: {input_path}")
+        with open(str(input_path), 'rb') as raw_handle:
+            dctx = zstandard.ZstdDecompressor()
+            with dctx.stream_reader(raw_handle) as zst_reader:
+                with tarfile.open(fileobj=zst_reader,
+                                  mode='r|') as tar_handle:
+                    for name, member in _iter_tar_members(
+                            tar_handle, file_ext, min_mtime):
+                        yield name, as_member(member)
+    elif archive_ext == dump_pack.PACK_EXT:
+        with dump_pack.DumpPack(input_path) as pack:
+            for name, dump_bytes in pack.iter_dumps(file_ext, min_mtime):
+                yield name, as_member(io.BytesIO(dump_bytes))
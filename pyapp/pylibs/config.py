@@ -18,6 +18,17 @@ DEBUG = False
 VERBOSE = False
 DEMO_ENABLED = True
 TEMP_TAG = '~'
+# guarded read limits per tag dump file
+SNIFF_BYTES = 4096
+MAX_LINE_BYTES = 16 * 1024
+MAX_FILE_BYTES = 32 * 1024 * 1024
+MAX_FILE_SECONDS = 10.0
+# read-ahead of tag dump heads (network shares: open latency dominates)
+PREFETCH_DEPTH = 8
+PREFETCH_BYTES = 64 * 1024
+# sending AET prefixes of inside studies (same as PS script $AET_PATTERN)
+AET_PATTERN = ['ADAC_', 'AEGISWEB', 'FILA_', 'VANC_', 'MCPB_', 'MEHC_',
+               'RSEND_', 'SWMC_', 'SW_', 'SW_CATH', 'VHI_']
 
 __all__ = ['print_current_packages', 'get_login',
            'get_isp_info', 'print_header']
@@ -1,17 +1,38 @@
 # -*- coding: UTF-8 -*-
-"""DICOM centric utilities for DCMTK and Fuji tags."""
+"""DICOM centric utilities for DCMTK, Fuji and dcm2xml tags."""
 import pathlib
+import re
 from collections import OrderedDict
+from xml.etree import ElementTree
+from xml.parsers import expat
 
-__all__ = ['build_fuji_tag_dict', 'build_dcmtk_tag_dict']
+__all__ = ['build_fuji_tag_dict', 'build_dcmtk_tag_dict',
+           'build_xml_tag_dict', 'parse_xml_tag_dump',
+           'build_keyword_tag_dict', 'extract_dataset_tags',
+           'sniff_dump_format', 'is_date_in_window',
+           'normalize_transfer_syntax', 'get_dump_sop_uid']
 
 FUJI_TAG = 'Grp  Elmt | Description'
 DCMTK_TAG = 'Dicom-Meta-Information-Header'
+XML_TAG = '<file-format'
 
 HEADERS = ["filename", "accessionNumber", "modality",
            "sourceApplicationEntityTitle", "stationName",
            "institutionName", "manufacturer",
-           "manufacturerModelName", "transferSyntaxUid"]
+           "manufacturerModelName", "transferSyntaxUid", "studyDate"]
+
+# StudyDate (0008,0020) then ContentDate (0008,0023) fallback per format
+DATE_TAGS = {'dcmtk': ('(0008,0020)', '(0008,0023)'),
+             'fuji': ('0008 0020', '0008 0023'),
+             'xml': ('0008,0020', '0008,0023'),
+             'keyword': ('StudyDate', 'ContentDate')}
+# SOPInstanceUID (0008,0018) then MediaStorageSOPInstanceUID (0002,0003)
+SOP_UID_TAGS = {'dcmtk': ('(0008,0018)', '(0002,0003)'),
+                'fuji': ('0008 0018', '0002 0003'),
+                'xml': ('0008,0018', '0002,0003')}
+
+# longest element text kept by parse_xml_tag_dump (values are short VRs)
+MAX_XML_VALUE_CHARS = 4096
 
 TRANSFER_SYNTAX = OrderedDict(
     [("1.2.840.10008.1.2", 'LittleEndianImplicit'),  # ILE
@@ -25,6 +46,76 @@ TRANSFER_SYNTAX = OrderedDict(
      ("1.2.840.10008.1.2.4.91", 'JPEG2000'),  # J2K
      ("1.2.840.10008.1.2.5", 'RunLengthEncoding')])  # RLE
 TRANSFER_SYNTAX.update({v: k for k, v in TRANSFER_SYNTAX.items()})
+# dcmdump prints DCMTK names instead of transfer syntax UIDs
+DCMTK_TRANSFER_SYNTAX = OrderedDict(
+    [('LittleEndianImplicit', "1.2.840.10008.1.2"),
+     ('LittleEndianExplicit', "1.2.840.10008.1.2.1"),
+     ('DeflatedLittleEndianExplicit', "1.2.840.10008.1.2.1.99"),
+     ('BigEndianExplicit', "1.2.840.10008.1.2.2"),
+     ('JPEGBaseline', "1.2.840.10008.1.2.4.50"),
+     ('JPEGExtended:Process2+4', "1.2.840.10008.1.2.4.51"),
+     ('JPEGLossless:Non-hierarchical:Process14', "1.2.840.10008.1.2.4.57"),
+     ('JPEGLossless:Non-hierarchical-1stOrderPrediction',
+      "1.2.840.10008.1.2.4.70"),
+     ('JPEG-LSLossless', "1.2.840.10008.1.2.4.80"),
+     ('JPEG-LSLossy(Near-lossless)', "1.2.840.10008.1.2.4.81"),
+     ('JPEG2000LosslessOnly', "1.2.840.10008.1.2.4.90"),
+     ('JPEG2000', "1.2.840.10008.1.2.4.91"),
+     ('RLELossless', "1.2.840.10008.1.2.5")])
+
+
+def is_date_in_window(date_str: str, date_window: tuple) -> bool:
+    """True if yyyyMMdd date within (since, until), unknown dates kept."""
+    date_str = ''.join(char for char in str(date_str) if char.isdigit())
+    if not date_window or len(date_str) != 8:
+        return True
+    since, until = date_window
+    return (not since or date_str >= since) and \
+        (not until or date_str <= until)
+
+
+def normalize_transfer_syntax(value: str) -> str:
+    """Transfer syntax UID of a UID, DCMTK name or TRANSFER_SYNTAX name."""
+    # one form for every source: DCMTK dumps name what others give as UID
+    value = str(value or '').strip().rstrip('\x00')
+    name_key = value.replace(' ', '')
+    if name_key in DCMTK_TRANSFER_SYNTAX:
+        return DCMTK_TRANSFER_SYNTAX[name_key]
+    if name_key in TRANSFER_SYNTAX and not name_key[:1].isdigit():
+        return TRANSFER_SYNTAX[name_key]
+    return value
+
+
+def get_dump_sop_uid(head_str: str, dump_format: str) -> str:
+    """SOPInstanceUID from the leading text of a dump, '' if not in it."""
+    for tag in SOP_UID_TAGS.get(dump_format, ()):
+        if dump_format == 'xml':
+            match = re.search(rf'<element tag="{tag}"[^>]*>([^<]*)<',
+                              head_str, re.IGNORECASE)
+            value = match.group(1) if match else ''
+        else:
+            line_str = next((line for line in head_str.splitlines()
+                             if tag in line), '')
+            # DCMTK: value between [..], Fuji: between ".."
+            delims = '[]' if dump_format == 'dcmtk' else '""'
+            value = line_str.split(delims[0], 1)[1].split(delims[1])[0] \
+                if delims[0] in line_str else ''
+        if value.strip():
+            return value.strip().rstrip('\x00')
+    return ''
+
+
+def sniff_dump_format(sample_str: str) -> str:
+    """Returns 'fuji', 'dcmtk', 'xml' or '' from leading text of a file."""
+    # same first n-lines as is_fuji_tag_dump() for text dumps
+    for line_str in sample_str.splitlines()[0:5]:
+        if FUJI_TAG in line_str:
+            return 'fuji'
+        if DCMTK_TAG in line_str:
+            return 'dcmtk'
+    if XML_TAG in sample_str:
+        return 'xml'
+    return ''
 
 
 # tag: (0008,0050) is represented as '0008 0050' for FUJI sourced files
@@ -40,6 +131,7 @@ def build_fuji_tag_dict(input_filename: pathlib.Path) -> dict:
     fuji_tag_dict['manufacturer'] = '0008 0070'
     fuji_tag_dict['manufacturerModelName'] = '0008 1090'
     fuji_tag_dict['transferSyntaxUid'] = '0002 0010'
+    fuji_tag_dict['studyDate'] = '0008 0020'
     return fuji_tag_dict
 
 
@@ -56,9 +148,141 @@ def build_dcmtk_tag_dict(input_filename: pathlib.Path) -> dict:
     dcmtk_tag_dict['manufacturer'] = '(0008,0070)'
     dcmtk_tag_dict['manufacturerModelName'] = '(0008,1090)'
     dcmtk_tag_dict['transferSyntaxUid'] = '(0002,0010)'
+    dcmtk_tag_dict['studyDate'] = '(0008,0020)'
     return dcmtk_tag_dict
 
 
+# tag: (0008,0050) is represented as '0008,0050' for dcm2xml sourced files
+def build_xml_tag_dict(input_filename: pathlib.Path) -> dict:
+    """Creates mapping of dcm2xml tag names to values"""
+    xml_tag_dict = OrderedDict()
+    xml_tag_dict['filename'] = str(input_filename)
+    xml_tag_dict['accessionNumber'] = '0008,0050'
+    xml_tag_dict['modality'] = '0008,0060'
+    xml_tag_dict['sourceApplicationEntityTitle'] = '0002,0016'
+    xml_tag_dict['stationName'] = '0008,1010'
+    xml_tag_dict['institutionName'] = '0008,0080'
+    xml_tag_dict['manufacturer'] = '0008,0070'
+    xml_tag_dict['manufacturerModelName'] = '0008,1090'
+    xml_tag_dict['transferSyntaxUid'] = '0002,0010'
+    xml_tag_dict['studyDate'] = '0008,0020'
+    return xml_tag_dict
+
+
+def parse_xml_tag_dump(xml_chunks, xml_tag_dict: dict,
+                       date_window: tuple = None) -> OrderedDict:
+    """Incrementally extracts top-level dcm2xml element values."""
+    # lookup: '0008,0050' -> 'accessionNumber'
+    tag_keys = OrderedDict([(tag.lower(), key) for key, tag in
+                            xml_tag_dict.items() if key != 'filename'])
+    tag_values = OrderedDict([(key, '') for key in xml_tag_dict])
+    remaining = set(tag_keys)
+    # date_window: abandon (return None) once date is known to be outside
+    study_tag, content_tag = DATE_TAGS['xml']
+    date_tags = (study_tag, content_tag) if date_window else ()
+    # SAX style: only text of wanted elements is buffered (capped), other
+    # text (e.g. inline base64 pixel data) is dropped as expat streams it
+    parser = expat.ParserCreate()
+    seq_depth = 0  # ignore same tags nested within sequence items
+    value_tag = None
+    value_parts = []
+    value_len = 0
+    is_outside = False
+
+    def start_element(name: str, attrs: dict) -> None:
+        nonlocal seq_depth, value_tag, value_len
+        if name == 'sequence':
+            seq_depth += 1
+        elif name == 'element' and seq_depth == 0:
+            tag = attrs.get('tag', '').lower()
+            if tag in remaining or tag in date_tags:
+                value_tag = tag
+                value_parts.clear()
+                value_len = 0
+
+    def char_data(data: str) -> None:
+        nonlocal value_len
+        if value_tag is not None and value_len < MAX_XML_VALUE_CHARS:
+            value_parts.append(data[:MAX_XML_VALUE_CHARS - value_len])
+            value_len += len(value_parts[-1])
+
+    def end_element(name: str) -> None:
+        nonlocal seq_depth, value_tag, date_tags, is_outside
+        if name == 'sequence':
+            seq_depth -= 1
+        elif name == 'element' and value_tag is not None:
+            value_str = ''.join(value_parts).strip()
+            if value_tag in remaining:
+                tag_values[tag_keys[value_tag]] = value_str
+                remaining.discard(value_tag)
+            if value_tag in date_tags and \
+                    (value_str or value_tag == content_tag):
+                date_tags = ()  # StudyDate decides, else ContentDate
+                is_outside = not is_date_in_window(value_str, date_window)
+            value_tag = None
+
+    parser.StartElementHandler = start_element
+    parser.CharacterDataHandler = char_data
+    parser.EndElementHandler = end_element
+    for chunk in xml_chunks:
+        try:
+            parser.Parse(chunk, False)
+        except expat.ExpatError as exp:  # same error as ElementTree parsers
+            raise ElementTree.ParseError(str(exp)) from exp
+        if is_outside:
+            return None
+        if not remaining:
+            break  # all tags found: skip rest of dump (e.g. pixel data)
+    if 'transferSyntaxUid' in tag_values:
+        tag_values['transferSyntaxUid'] = normalize_transfer_syntax(
+            tag_values['transferSyntaxUid'])
+    return tag_values
+
+
+# tag: (0008,0050) is represented as 'AccessionNumber' for pydicom datasets
+def build_keyword_tag_dict(input_filename: pathlib.Path) -> dict:
+    """Creates mapping of DICOM keyword tag names to values"""
+    keyword_tag_dict = OrderedDict()
+    keyword_tag_dict['filename'] = str(input_filename)
+    keyword_tag_dict['accessionNumber'] = 'AccessionNumber'
+    keyword_tag_dict['modality'] = 'Modality'
+    keyword_tag_dict['sourceApplicationEntityTitle'] = \
+        'SourceApplicationEntityTitle'
+    keyword_tag_dict['stationName'] = 'StationName'
+    keyword_tag_dict['institutionName'] = 'InstitutionName'
+    keyword_tag_dict['manufacturer'] = 'Manufacturer'
+    keyword_tag_dict['manufacturerModelName'] = 'ManufacturerModelName'
+    keyword_tag_dict['transferSyntaxUid'] = 'TransferSyntaxUID'
+    keyword_tag_dict['studyDate'] = 'StudyDate'
+    return keyword_tag_dict
+
+
+def extract_dataset_tags(dataset, keyword_tag_dict: dict) -> OrderedDict:
+    """Reads desired values from an in-memory (pydicom) dataset."""
+    tag_values = OrderedDict([(key, '') for key in keyword_tag_dict])
+    tag_values['filename'] = pathlib.PurePath(
+        keyword_tag_dict['filename']).name
+    # group 0002 (meta header) values are stored in dataset.file_meta
+    file_meta = getattr(dataset, 'file_meta', None)
+    for key, keyword in keyword_tag_dict.items():
+        if key == 'filename':
+            continue
+        value = dataset.get(keyword, None)
+        if value is None and file_meta is not None:
+            value = file_meta.get(keyword, None)
+        if value is None:
+            continue
+        if hasattr(value, '__iter__') and not isinstance(value,
+                                                         (str, bytes)):
+            # multi-valued: backslash delimited as in DCMTK dumps
+            value = '\\'.join(str(val) for val in value)
+        tag_values[key] = str(value).strip()
+    if 'transferSyntaxUid' in tag_values:
+        tag_values['transferSyntaxUid'] = normalize_transfer_syntax(
+            tag_values['transferSyntaxUid'])
+    return tag_values
+
+
 '''
    0002 0016 | sourceApplicationEntityTitle
    0008 0050 | accessionNumber
@@ -67,6 +291,7 @@ def build_dcmtk_tag_dict(input_filename: pathlib.Path) -> dict:
    0008 0080 | institutionName
    0008 0070 | manufacturer
    0008 1090 | manufacturerModelName
+   0008 0020 | studyDate
 
 http://dicomlookup.com/default.asp
 http://dicom.nema.org/dicom/2013/output/chtml/part05/sect_6.2.html
@@ -81,4 +306,9 @@ DCMTK:  number sign # present in each line
 key: between (####,####)
 value: between square brackets [...]
 example:   (0008,0060) CS [CT]         #   2, 1 Modality
+
+DCM2XML:  <element> nodes nested in <meta-header> or <data-set>
+key: tag attribute 'gggg,eeee' (lowercase hex)
+value: element text
+example:   <element tag="0008,0060" vr="CS" vm="1" len="2">CT</element>
 '''
@@ -0,0 +1,300 @@
+# -*- coding: UTF-8 -*-
+"""Bounded memory diff of two transfer result sets (external merge join)."""
+import csv
+import datetime
+import heapq
+import itertools
+import pathlib
+import sqlite3
+import tempfile
+import zipfile
+from collections import Counter
+from xml.etree import ElementTree
+from . import dicom_tools
+from . import transfer_store
+
+__all__ = ['KEY_COLUMNS', 'VOLUME_COLUMNS', 'iter_xlsx_rows',
+           'iter_result_rows', 'external_sort', 'iter_row_deltas',
+           'diff_results']
+
+KEY_COLUMNS = ['accessionNumber', 'sourceApplicationEntityTitle']
+VOLUME_COLUMNS = ['sourceApplicationEntityTitle', 'stationName',
+                  'institutionName']
+# dump filenames differ between runs of the same study
+IGNORED_COLUMNS = ['filename']
+SORT_CHUNK_ROWS = 100000  # rows sorted in memory per spilled run
+SQLITE_MAGIC = b'SQLite format 3\x00'
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+# PS script report headers that are not simply a capitalized HEADERS name
+HEADER_ALIASES = {'dicom': 'filename'}
+# PS script reports keep dates as Excel serial day numbers
+EXCEL_EPOCH = datetime.date(1899, 12, 30)
+EXCEL_MAX_DAYS = 100000
+
+
+def _normalize_header(header: str) -> str:
+    """Maps report/CSV/store header to HEADERS name, '' if not reported."""
+    header_key = str(header or '').strip().rstrip(':').strip().lower()
+    header_key = HEADER_ALIASES.get(header_key, header_key)
+    return next((hdr for hdr in dicom_tools.HEADERS
+                 if hdr.lower() == header_key), '')
+
+
+def _sanitize_date(date_str: str) -> str:
+    """'yyyyMMdd' of a DICOM/ISO date or of an Excel date serial number."""
+    try:
+        excel_days = float(date_str)
+    except ValueError:
+        return transfer_store.sanitize_date(date_str)
+    if excel_days >= EXCEL_MAX_DAYS:  # already a yyyyMMdd number
+        return transfer_store.sanitize_date(date_str)
+    excel_date = EXCEL_EPOCH + datetime.timedelta(days=int(excel_days))
+    return excel_date.strftime('%Y%m%d')
+
+
+def _get_column_index(cell_ref: str) -> int:
+    """Returns zero based column index of an 'AB12' style cell reference."""
+    col_index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        col_index = col_index * 26 + ord(char.upper()) - ord('A') + 1
+    return col_index - 1
+
+
+def _iter_elements(xml_handle, tag_name: str):
+    """Yields each streamed tag_name element, then frees it and siblings."""
+    # parents stay referenced by the parser: clearing the root is not enough
+    parents = []
+    for event, elem in ElementTree.iterparse(xml_handle, ('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag == f"{XLSX_NS}{tag_name}":
+            yield elem
+            elem.clear()
+            if parents:
+                parents[-1].clear()
+
+
+def _iter_element_text(xml_handle, tag_name: str):
+    """Yields joined text of each streamed tag_name element (then freed)."""
+    for elem in _iter_elements(xml_handle, tag_name):
+        yield ''.join(elem.itertext())
+
+
+def iter_xlsx_rows(xlsx_path: pathlib.Path):
+    """Yields cell value lists of first worksheet (no 'openpyxl' needed)."""
+    # rows are streamed, the shared string table is held in memory: cells
+    # index it randomly (report strings repeat, so the table stays small)
+    with zipfile.ZipFile(str(xlsx_path), 'r') as xlsx_zip:
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in xlsx_zip.namelist():
+            with xlsx_zip.open('xl/sharedStrings.xml') as xml_handle:
+                shared_strings = list(_iter_element_text(xml_handle, 'si'))
+        with xlsx_zip.open('xl/worksheets/sheet1.xml') as xml_handle:
+            for elem in _iter_elements(xml_handle, 'row'):
+                row = []
+                for cell in elem.iter(f"{XLSX_NS}c"):
+                    col_index = _get_column_index(cell.get('r', ''))
+                    row.extend([''] * (col_index - len(row)))
+                    if cell.get('t') == 'inlineStr':
+                        value = ''.join(cell.find(f"{XLSX_NS}is").itertext())
+                    else:
+                        value = cell.findtext(f"{XLSX_NS}v", '')
+                        if cell.get('t') == 's' and value:
+                            value = shared_strings[int(value)]
+                    row.append(value)
+                yield row
+
+
+def _iter_raw_rows(input_path: pathlib.Path):
+    """Yields rows of any supported sink, first row contains headers."""
+    with open(str(input_path), 'rb') as sniff_handle:
+        magic = sniff_handle.read(len(SQLITE_MAGIC))
+    if magic == SQLITE_MAGIC:
+        conn = sqlite3.connect(str(input_path))
+        try:
+            cursor = conn.execute(
+                f"SELECT * FROM {transfer_store.TABLE_NAME}")
+            yield [desc[0] for desc in cursor.description]
+            yield from cursor  # fetched lazily, never all at once
+        finally:
+            conn.close()
+    elif zipfile.is_zipfile(str(input_path)):
+        yield from iter_xlsx_rows(input_path)
+    else:
+        with open(str(input_path), 'r', encoding='utf-8', newline='') as \
+                csv_file:
+            yield from csv.reader(csv_file)
+
+
+def iter_result_rows(input_path: pathlib.Path):
+    """Yields HEADERS ordered rows of .xlsx report, .csv or SQLite store."""
+    raw_rows = _iter_raw_rows(input_path)
+    headers = [_normalize_header(hdr) for hdr in next(raw_rows, [])]
+    if not set(KEY_COLUMNS).issubset(headers):
+        raise ValueError(f"missing key columns {KEY_COLUMNS}: "
+                         f"'{input_path}'")
+    col_map = [(headers.index(hdr) if hdr in headers else -1)
+               for hdr in dicom_tools.HEADERS]
+    date_idx = dicom_tools.HEADERS.index('studyDate')
+    syntax_idx = dicom_tools.HEADERS.index('transferSyntaxUid')
+    for raw_row in raw_rows:
+        if not any(raw_row):
+            continue  # blank spreadsheet/CSV rows
+        row = [str(raw_row[idx] if raw_row[idx] is not None else '')
+               if 0 <= idx < len(raw_row) else '' for idx in col_map]
+        row[date_idx] = _sanitize_date(row[date_idx])
+        # DCMTK dump rows name the syntax, other sources give its UID
+        row[syntax_idx] = dicom_tools.normalize_transfer_syntax(
+            row[syntax_idx])
+        yield row
+
+
+def _write_run(sorted_rows: list, temp_dir: str, run_num: int) -> str:
+    """Spills a sorted run to a temporary CSV file."""
+    run_path = str(pathlib.Path(temp_dir, f"run_{run_num:05}.csv"))
+    with open(run_path, 'w', encoding='utf-8', newline='') as run_file:
+        csv.writer(run_file).writerows(sorted_rows)
+    return run_path
+
+
+def external_sort(rows, chunk_rows: int = SORT_CHUNK_ROWS,
+                  temp_dir: str = None):
+    """Yields rows (lists of str) in sorted order using sorted disk runs."""
+    # memory: chunk_rows rows plus one buffered row per run during merge
+    with tempfile.TemporaryDirectory(dir=temp_dir) as run_dir:
+        run_paths = []
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                run_paths.append(_write_run(sorted(chunk), run_dir,
+                                            len(run_paths)))
+                chunk = []
+        if not run_paths:  # fits in one chunk: no disk round trip
+            yield from sorted(chunk)
+            return
+        if chunk:
+            run_paths.append(_write_run(sorted(chunk), run_dir,
+                                        len(run_paths)))
+        run_files = [open(run_path, 'r', encoding='utf-8', newline='')
+                     for run_path in run_paths]
+        try:
+            yield from heapq.merge(*[csv.reader(run_file)
+                                     for run_file in run_files])
+        finally:
+            for run_file in run_files:
+                run_file.close()
+
+
+def _iter_sorted_groups(rows, chunk_rows: int, temp_dir: str):
+    """Yields (key, rows of key) in key order via external sort."""
+    key_idx = [dicom_tools.HEADERS.index(col) for col in KEY_COLUMNS]
+    keyed_rows = ([row[idx] for idx in key_idx] + row for row in rows)
+    sorted_rows = external_sort(keyed_rows, chunk_rows, temp_dir)
+    for key, group in itertools.groupby(
+            sorted_rows, key=lambda row: row[:len(key_idx)]):
+        yield key, [row[len(key_idx):] for row in group]
+
+
+def _get_changes(old_row: list, new_row: list) -> str:
+    """Describes changed compared columns: "col: 'old' -> 'new'"."""
+    return '; '.join(f"{hdr}: '{old_val}' -> '{new_val}'"
+                     for hdr, old_val, new_val in
+                     zip(dicom_tools.HEADERS, old_row, new_row)
+                     if old_val != new_val and hdr not in IGNORED_COLUMNS)
+
+
+def _diff_group(old_group: list, new_group: list):
+    """Yields deltas of rows sharing one key: unchanged rows are dropped."""
+    compare_idx = [idx for idx, hdr in enumerate(dicom_tools.HEADERS)
+                   if hdr not in IGNORED_COLUMNS]
+
+    def compare_key(row: list) -> tuple:
+        return tuple(row[idx] for idx in compare_idx)
+    old_counts = Counter(compare_key(row) for row in old_group)
+    new_counts = Counter(compare_key(row) for row in new_group)
+    old_rest = []
+    for row in old_group:
+        if new_counts[compare_key(row)] > 0:
+            new_counts[compare_key(row)] -= 1
+        else:
+            old_rest.append(row)
+    new_rest = []
+    for row in new_group:
+        if old_counts[compare_key(row)] > 0:
+            old_counts[compare_key(row)] -= 1
+        else:
+            new_rest.append(row)
+    for old_row, new_row in zip(old_rest, new_rest):
+        yield 'changed', new_row, _get_changes(old_row, new_row)
+    for old_row in old_rest[len(new_rest):]:
+        yield 'missing', old_row, ''
+    for new_row in new_rest[len(old_rest):]:
+        yield 'new', new_row, ''
+
+
+def iter_row_deltas(old_rows, new_rows, chunk_rows: int = SORT_CHUNK_ROWS,
+                    temp_dir: str = None):
+    """Merge join on KEY_COLUMNS, yields (status, row, changed columns)."""
+    old_groups = _iter_sorted_groups(old_rows, chunk_rows, temp_dir)
+    new_groups = _iter_sorted_groups(new_rows, chunk_rows, temp_dir)
+    old_key, old_group = next(old_groups, (None, []))
+    new_key, new_group = next(new_groups, (None, []))
+    while old_key is not None or new_key is not None:
+        if new_key is None or (old_key is not None and old_key < new_key):
+            for row in old_group:
+                yield 'missing', row, ''
+            old_key, old_group = next(old_groups, (None, []))
+        elif old_key is None or new_key < old_key:
+            for row in new_group:
+                yield 'new', row, ''
+            new_key, new_group = next(new_groups, (None, []))
+        else:
+            yield from _diff_group(old_group, new_group)
+            old_key, old_group = next(old_groups, (None, []))
+            new_key, new_group = next(new_groups, (None, []))
+
+
+def _count_volumes(rows, volume_counts: dict):
+    """Passes rows through, counting VOLUME_COLUMNS values."""
+    volume_idx = [(col, dicom_tools.HEADERS.index(col))
+                  for col in VOLUME_COLUMNS]
+    for row in rows:
+        for col, idx in volume_idx:
+            volume_counts[(col, row[idx])] += 1
+        yield row
+
+
+def diff_results(old_path: pathlib.Path, new_path: pathlib.Path,
+                 rows_path: pathlib.Path, chunk_rows: int = SORT_CHUNK_ROWS,
+                 temp_dir: str = None) -> tuple:
+    """Streams delta rows to CSV, returns (status counts, volume deltas)."""
+    # volume deltas: [column, value, old, new, delta], first row headers
+    old_volumes = Counter()
+    new_volumes = Counter()
+    status_counts = Counter({'new': 0, 'missing': 0, 'changed': 0})
+    with open(str(rows_path), 'w', encoding='utf-8', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(['status'] + dicom_tools.HEADERS + ['changes'])
+        for status, row, changes in iter_row_deltas(
+                _count_volumes(iter_result_rows(old_path), old_volumes),
+                _count_volumes(iter_result_rows(new_path), new_volumes),
+                chunk_rows, temp_dir):
+            status_counts[status] += 1
+            csv_writer.writerow([status] + row + [changes])
+    volume_list = []
+    for col, value in set(old_volumes) | set(new_volumes):
+        old_count = old_volumes[(col, value)]
+        new_count = new_volumes[(col, value)]
+        if old_count != new_count:
+            volume_list.append([col, value, old_count, new_count,
+                                new_count - old_count])
+    # per column: largest volume changes first
+    volume_list.sort(key=lambda row: (VOLUME_COLUMNS.index(row[0]),
+                                      -abs(row[4]), row[1]))
+    return status_counts, [['column', 'value', 'old', 'new', 'delta']] + \
+        volume_list
@@ -0,0 +1,206 @@
+# -*- coding: UTF-8 -*-
+"""Native DICOM JSON (PS3.18) and dcm2xml-style XML dumps of .dcm files."""
+import json
+import pathlib
+from xml.sax.saxutils import escape, quoteattr
+try:
+    import pydicom
+    from pydicom.datadict import dictionary_VR, keyword_for_tag
+    from pydicom.dataelem import RawDataElement
+except ImportError:  # optional: only required for dump mode
+    pydicom = None
+from . import file_tools
+
+__all__ = ['DUMP_FORMATS', 'iter_study_dicoms', 'build_json_dict',
+           'build_xml_lines', 'render_dicom_dumps', 'emit_dicom_dumps']
+
+DUMP_FORMATS = ('json', 'xml')
+# larger values (pixel data, overlays) are never read, only their offset
+DEFER_SIZE = 4096
+BINARY_VRS = ('OB', 'OD', 'OF', 'OL', 'OV', 'OW', 'UN')
+NUMBER_VR_SIZES = {'AT': 4, 'FD': 8, 'FL': 4, 'SL': 4, 'SS': 2, 'SV': 8,
+                   'UL': 4, 'US': 2, 'UV': 8}
+
+
+def iter_study_dicoms(input_path: pathlib.Path, exclude_dirs=None):
+    """Yields (study folder, largest .dcm) of each study sub-folder."""
+    # same selection as PS script: largest file avoids PR/SR instances
+    for study_path in file_tools.iter_directories(
+            input_path, recursive=False, exclude_dirs=exclude_dirs,
+            sort=True):
+        largest = max(file_tools.scan_entries(study_path, '.dcm',
+                                              exclude_dirs=exclude_dirs),
+                      key=lambda entry: entry.stat().st_size, default=None)
+        if largest is not None:
+            yield study_path, pathlib.Path(largest.path)
+
+
+def _format_tag(tag, separator: str = ',') -> str:
+    """Returns 'gggg,eeee' (dcm2xml) or 'GGGGEEEE' (separator='') tag."""
+    tag_str = f"{tag.group:04x}{separator}{tag.element:04x}"
+    return tag_str if separator else tag_str.upper()
+
+
+def _get_name(tag) -> str:
+    """Returns DICOM keyword of tag, named like dcm2xml when unknown."""
+    if tag.element == 0:
+        return 'GenericGroupLength' if tag.group != 2 else \
+            'FileMetaInformationGroupLength'
+    return keyword_for_tag(tag) or 'Unknown Tag & Data'
+
+
+def _iter_elements(dataset):
+    """Yields (element, raw length or None, value offset or None)."""
+    # raw elements are converted one by one: deferred values stay unread
+    for tag in dataset.keys():
+        raw_elem = dataset.get_item(tag, keep_deferred=True)
+        if isinstance(raw_elem, RawDataElement):
+            if raw_elem.value is None and raw_elem.length != 0:
+                yield raw_elem, raw_elem.length, raw_elem.value_tell
+                continue
+            yield dataset[tag], raw_elem.length, None
+        else:
+            yield raw_elem, None, None
+
+
+def _get_vr(elem) -> str:
+    """Returns element VR, ambiguous dictionary VRs of unread values."""
+    vr = elem.VR or dictionary_VR(elem.tag)
+    return 'OW' if vr == 'OB or OW' else vr.split(' or ')[0]
+
+
+def _get_value_length(elem) -> int:
+    """Returns even padded value length of a converted element."""
+    if elem.VM == 0 or elem.VR == 'SQ':
+        return 0
+    if elem.VR in NUMBER_VR_SIZES:
+        return NUMBER_VR_SIZES[elem.VR] * elem.VM
+    if isinstance(elem.value, bytes):
+        value_len = len(elem.value)
+    else:
+        value_len = len(_format_value(elem).encode('utf-8'))
+    return value_len + value_len % 2
+
+
+def _format_value(elem) -> str:
+    """Returns multi-values joined with a backslash (dcm2xml/dcmdump)."""
+    if elem.VM > 1:
+        return '\\'.join(str(val) for val in elem.value)
+    return '' if elem.value is None else str(elem.value)
+
+
+def build_json_dict(dataset, bulk_data_uri: str = '') -> dict:
+    """DICOM JSON model of dataset, unread values as offset BulkDataURI."""
+    json_dict = {}
+    for elem, length, value_tell in _iter_elements(dataset):
+        tag_str = _format_tag(elem.tag, '')
+        if value_tell is not None:
+            json_dict[tag_str] = {
+                'vr': _get_vr(elem),
+                'BulkDataURI': f"{bulk_data_uri}?offset={value_tell}"
+                               f"&length={length}"}
+        elif elem.VR == 'SQ':
+            seq_dict = {'vr': 'SQ'}
+            if elem.value:
+                seq_dict['Value'] = [build_json_dict(item, bulk_data_uri)
+                                     for item in elem.value]
+            json_dict[tag_str] = seq_dict
+        else:
+            # no bulk data handler: small binary values are InlineBinary
+            json_dict[tag_str] = elem.to_json_dict(None, DEFER_SIZE)
+    return json_dict
+
+
+def build_xml_lines(dataset) -> list:
+    """dcm2xml-style element/sequence lines of dataset."""
+    xml_lines = []
+    for elem, length, value_tell in _iter_elements(dataset):
+        if length is None:
+            length = _get_value_length(elem)
+        attrs = (f'tag="{_format_tag(elem.tag)}" vr="{_get_vr(elem)}" '
+                 f'vm="{1 if value_tell is not None else elem.VM}" '
+                 f'len="{length}" name={quoteattr(_get_name(elem.tag))}')
+        if value_tell is not None:
+            xml_lines.append(f'<element {attrs} loaded="no" '
+                             f'offset="{value_tell}" binary="hidden">'
+                             f'</element>')
+        elif elem.VR == 'SQ':
+            xml_lines.append(f'<sequence '
+                             f'tag="{_format_tag(elem.tag)}" vr="SQ" '
+                             f'card="{len(elem.value)}" '
+                             f'name={quoteattr(_get_name(elem.tag))}>')
+            for item in elem.value:
+                xml_lines.append(f'<item card="{len(item)}">')
+                xml_lines.extend(build_xml_lines(item))
+                xml_lines.append('</item>')
+            xml_lines.append('</sequence>')
+        elif elem.VR in BINARY_VRS:
+            xml_lines.append(f'<element {attrs} binary="hidden">'
+                             f'</element>')
+        else:
+            xml_lines.append(f'<element {attrs}>'
+                             f'{escape(_format_value(elem))}</element>')
+    return xml_lines
+
+
+def _get_xfer_attrs(xfer_uid: str) -> str:
+    """Returns dcm2xml 'xfer'/'name' attributes of a transfer syntax."""
+    xfer_name = pydicom.uid.UID(xfer_uid).name if xfer_uid else ''
+    return f'xfer="{xfer_uid}" name={quoteattr(xfer_name)}'
+
+
+def render_dicom_dumps(dcm_path: pathlib.Path,
+                       dump_formats=DUMP_FORMATS) -> tuple:
+    """Reads a .dcm once (header only), returns its JSON and/or XML dumps."""
+    # returns ({'.json'/'.xml': dump str}, SOPInstanceUID, error status)
+    if pydicom is None:
+        return {}, '', "~!ERROR!~ 'pydicom' package required for dump mode"
+    dump_dict = {}
+    try:
+        dataset = pydicom.dcmread(str(dcm_path), defer_size=DEFER_SIZE,
+                                  force=True)
+        if len(dataset) == 0:
+            return {}, '', \
+                f"~!ERROR!~ no DICOM data elements: '{dcm_path.name}'"
+        file_meta = getattr(dataset, 'file_meta', pydicom.Dataset())
+        if 'json' in dump_formats:
+            # group 0002 kept: SourceApplicationEntityTitle is reported
+            bulk_data_uri = dcm_path.resolve().as_uri()
+            json_dict = build_json_dict(file_meta, bulk_data_uri)
+            json_dict.update(build_json_dict(dataset, bulk_data_uri))
+            dump_dict['.json'] = json.dumps(json_dict)
+        if 'xml' in dump_formats:
+            xfer_uid = str(file_meta.get('TransferSyntaxUID', ''))
+            meta_attrs = _get_xfer_attrs(pydicom.uid.ExplicitVRLittleEndian)
+            xml_lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                         '<file-format>', f'<meta-header {meta_attrs}>']
+            xml_lines.extend(build_xml_lines(file_meta))
+            xml_lines.append('</meta-header>')
+            xml_lines.append(f'<data-set {_get_xfer_attrs(xfer_uid)}>')
+            xml_lines.extend(build_xml_lines(dataset))
+            xml_lines.extend(['</data-set>', '</file-format>', ''])
+            dump_dict['.xml'] = '\n'.join(xml_lines)
+        sop_instance_uid = str(dataset.get('SOPInstanceUID', '') or
+                               file_meta.get('MediaStorageSOPInstanceUID',
+                                             ''))
+    except (OSError, ValueError, TypeError, AttributeError, KeyError,
+            pydicom.errors.InvalidDicomError) as exp:
+        return {}, '', f"~!ERROR!~ {type(exp).__name__}: {exp}"
+    return dump_dict, sop_instance_uid, ''
+
+
+def emit_dicom_dumps(dcm_path: pathlib.Path, output_dir: pathlib.Path,
+                     dump_formats=DUMP_FORMATS) -> str:
+    """Reads a .dcm once (header only), writes its JSON and/or XML dumps."""
+    dump_dict, _, status_str = render_dicom_dumps(dcm_path, dump_formats)
+    if status_str:
+        return status_str
+    try:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for dump_ext, dump_str in dump_dict.items():
+            dump_path = pathlib.Path(output_dir, f"{dcm_path.stem}{dump_ext}")
+            with open(str(dump_path), 'w', encoding='utf-8') as dump_file:
+                dump_file.write(dump_str)
+    except OSError as exp:
+        return f"~!ERROR!~ {type(exp).__name__}: {exp}"
+    return ', '.join(f"{dcm_path.stem}{dump_ext}" for dump_ext in dump_dict)
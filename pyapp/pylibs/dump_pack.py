@@ -0,0 +1,193 @@
+# -*- coding: UTF-8 -*-
+"""Append-only container of compressed tag dumps with an offset index."""
+import os
+import pathlib
+import struct
+import time
+import zlib
+
+__all__ = ['PACK_EXT', 'INDEX_EXT', 'DumpPack']
+
+PACK_EXT = '.dpk'
+INDEX_EXT = '.idx'
+PACK_MAGIC = b'DPK1'
+FRAME_MAGIC = b'DPKF'
+# frame: magic, name len, uid len, compressed len, raw len, dump mtime
+FRAME_HEADER = struct.Struct('<4sHHIId')
+COMPRESS_LEVEL = 6
+
+
+class DumpPack:
+    """Pack of zlib frames, '.idx' sidecar maps name/SOPInstanceUID."""
+
+    def __init__(self, pack_path: pathlib.Path, mode: str = 'r'):
+        # mode 'r': read only, 'a': append (created if missing)
+        self.pack_path = pathlib.Path(pack_path)
+        self.index_path = pathlib.Path(f"{self.pack_path}{INDEX_EXT}")
+        self.mode = mode
+        self.name_index = {}  # name: (frame offset, frame length)
+        self.uid_index = {}  # SOPInstanceUID: name
+        if mode == 'a' and not self.pack_path.exists():
+            with open(str(self.pack_path), 'wb') as pack_file:
+                pack_file.write(PACK_MAGIC)
+        self.pack_handle = open(str(self.pack_path),
+                                'r+b' if mode == 'a' else 'rb')
+        if self.pack_handle.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            self.pack_handle.close()
+            raise ValueError(f"not a dump pack: '{self.pack_path}'")
+        self.end_offset = self._load_index()
+        self._recover_tail()
+        self.index_handle = None
+        if mode == 'a':
+            self.index_handle = open(str(self.index_path), 'a',
+                                     encoding='utf-8', newline='\n')
+
+    def _add_entry(self, name: str, uid: str, offset: int,
+                   length: int) -> None:
+        """Adds a frame to the in-memory indexes."""
+        self.name_index[name] = (offset, length)
+        if uid:  # dumps of one instance (.json/.xml): first packed wins
+            self.uid_index.setdefault(uid, name)
+
+    def _load_index(self) -> int:
+        """Loads '.idx' entries, returns end offset of last indexed frame."""
+        # entries past the end of the pack (pack truncated or replaced) are
+        # dropped: the pack is never grown to match a stale index
+        pack_size = os.fstat(self.pack_handle.fileno()).st_size
+        end_offset = len(PACK_MAGIC)
+        stale_count = 0
+        if self.index_path.is_file():
+            with open(str(self.index_path), 'r', encoding='utf-8') as idx:
+                for line_str in idx:
+                    fields = line_str.rstrip('\n').split('\t')
+                    if not line_str.endswith('\n') or len(fields) != 4:
+                        continue  # torn last line of an interrupted append
+                    name, uid, offset, length = fields
+                    if int(offset) + int(length) > pack_size:
+                        stale_count += 1
+                        continue
+                    self._add_entry(name, uid, int(offset), int(length))
+                    end_offset = max(end_offset, int(offset) + int(length))
+        if stale_count and self.mode == 'a':
+            self._drop_stale_entries(pack_size)
+        return end_offset
+
+    def _drop_stale_entries(self, pack_size: int) -> None:
+        """Rewrites '.idx' without entries past the end of the pack."""
+        # appended frames would otherwise land where stale entries point
+        temp_path = pathlib.Path(f"{self.index_path}.tmp")
+        with open(str(self.index_path), 'r', encoding='utf-8') as idx, \
+                open(str(temp_path), 'w', encoding='utf-8',
+                     newline='\n') as temp_idx:
+            for line_str in idx:
+                fields = line_str.rstrip('\n').split('\t')
+                if line_str.endswith('\n') and len(fields) == 4 and \
+                        int(fields[2]) + int(fields[3]) <= pack_size:
+                    temp_idx.write(line_str)
+        os.replace(str(temp_path), str(self.index_path))
+
+    def _recover_tail(self) -> None:
+        """Indexes frames missing from '.idx' (append: drops torn frame)."""
+        recovered = []
+        for name, uid, offset, length, _, _ in self._iter_frames(
+                self.end_offset, is_data=False):
+            self._add_entry(name, uid, offset, length)
+            recovered.append((name, uid, offset, length))
+            self.end_offset = offset + length
+        if self.mode != 'a':
+            return
+        # end_offset <= pack size: only a torn frame is ever cut off
+        self.pack_handle.truncate(self.end_offset)
+        if recovered:
+            with open(str(self.index_path), 'a', encoding='utf-8',
+                      newline='\n') as idx:
+                for entry in recovered:
+                    idx.write('\t'.join(str(val) for val in entry) + '\n')
+
+    def _iter_frames(self, start_offset: int, is_data: bool = True,
+                     file_ext='', min_mtime: float = 0.0):
+        """Yields (name, uid, offset, length, mtime, data) sequentially."""
+        # data is None for skipped frames (not is_data, ext or mtime)
+        pack_size = os.fstat(self.pack_handle.fileno()).st_size
+        self.pack_handle.seek(start_offset)
+        offset = start_offset
+        while offset + FRAME_HEADER.size <= pack_size:
+            magic, name_len, uid_len, data_len, _, mtime = \
+                FRAME_HEADER.unpack(self.pack_handle.read(FRAME_HEADER.size))
+            length = FRAME_HEADER.size + name_len + uid_len + data_len
+            if magic != FRAME_MAGIC or offset + length > pack_size:
+                return  # torn frame of an interrupted append
+            keys = self.pack_handle.read(name_len + uid_len)
+            name = keys[:name_len].decode('utf-8')
+            data = None
+            if is_data and name.endswith(file_ext) and mtime >= min_mtime:
+                data = zlib.decompress(self.pack_handle.read(data_len))
+            else:
+                self.pack_handle.seek(data_len, os.SEEK_CUR)
+            yield (name, keys[name_len:].decode('utf-8'), offset, length,
+                   mtime, data)
+            offset += length
+
+    def append(self, name: str, dump_bytes: bytes, uid: str = '',
+               mtime: float = None) -> bool:
+        """Appends a dump frame, False if name is already packed."""
+        if name in self.name_index:
+            return False
+        if any(char in f"{name}{uid}" for char in '\t\n'):
+            raise ValueError(f"tab/newline in dump name: {name!r}")
+        name_bytes = name.encode('utf-8')
+        uid_bytes = uid.encode('utf-8')
+        data = zlib.compress(dump_bytes, COMPRESS_LEVEL)
+        header = FRAME_HEADER.pack(FRAME_MAGIC, len(name_bytes),
+                                   len(uid_bytes), len(data),
+                                   len(dump_bytes),
+                                   time.time() if mtime is None else mtime)
+        frame = header + name_bytes + uid_bytes + data
+        self.pack_handle.seek(self.end_offset)
+        self.pack_handle.write(frame)
+        self.pack_handle.flush()  # frame on disk before it is indexed
+        self.index_handle.write(
+            f"{name}\t{uid}\t{self.end_offset}\t{len(frame)}\n")
+        self.index_handle.flush()
+        self._add_entry(name, uid, self.end_offset, len(frame))
+        self.end_offset += len(frame)
+        return True
+
+    def read(self, key: str) -> bytes:
+        """Random access: dump of a packed name or SOPInstanceUID."""
+        name = self.uid_index.get(key, key)
+        offset, _ = self.name_index[name]
+        frame = next(self._iter_frames(offset), None)
+        if frame is None or frame[0] != name:
+            raise KeyError(f"dump frame missing: {key}")
+        return frame[5]
+
+    def iter_dumps(self, file_ext='', min_mtime: float = None):
+        """Yields (name, dump bytes) in pack order, one sequential read."""
+        for name, _, _, _, _, data in self._iter_frames(
+                len(PACK_MAGIC), file_ext=file_ext,
+                min_mtime=min_mtime or 0.0):
+            if data is not None:
+                yield name, data
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.name_index or key in self.uid_index
+
+    def __len__(self) -> int:
+        return len(self.name_index)
+
+    def __iter__(self):
+        """Packed dump names in pack order (index only, nothing read)."""
+        return iter(self.name_index)
+
+    def close(self) -> None:
+        """Closes pack and index files."""
+        self.pack_handle.close()
+        if self.index_handle is not None:
+            self.index_handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,12 +1,16 @@
 # -*- coding: UTF-8 -*-
 """File tools module to for basic file I/O utilities."""
+import codecs
+import csv
 import datetime
 import inspect
 import hashlib
+import locale
 import os
 import pathlib
 import string
 import sys
+import time
 from collections import OrderedDict
 from collections import Counter
 import chardet
@@ -16,13 +20,22 @@ PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
 IS_WINDOWS = sys.platform.startswith('win')
 DEBUG = False
 SHOW_METHODS = False
+CHUNK_SIZE = 64 * 1024
+BOM_ENCODINGS = [(codecs.BOM_UTF8, 'utf-8-sig'),
+                 (codecs.BOM_UTF16_LE, 'utf-16'),
+                 (codecs.BOM_UTF16_BE, 'utf-16')]
+AVOID_DIRS = ['.git', '.idea', '.pytest_cache', 'venv',
+              '__pycache__', '__init__']
 
 __all__ = ['build_index_alphabet', 'bytes_to_readable',
            'is_encoded', 'check_encoding', 'remove_accents', 'get_sha256_hash',
            'get_directory_size', 'split_path', 'is_config_in_path',
-           'generate_date_str', 'save_output_txt', 'count_files',
-           'build_parent_size_str', 'build_extension_count_str',
-           'get_dir_stats', 'get_directories', 'get_files', 'get_extensions']
+           'generate_date_str', 'save_output_txt', 'save_output_csv',
+           'count_files', 'build_parent_size_str', 'build_extension_count_str',
+           'detect_bom_encoding', 'read_file_sample', 'iter_guarded_chunks',
+           'iter_guarded_lines', 'get_dir_stats', 'scan_entries',
+           'iter_files', 'iter_directories', 'get_directories', 'get_files',
+           'get_extensions']
 
 
 def show_methods(method_name: str) -> None:
@@ -123,6 +136,72 @@ def remove_accents(byte_input, byte_enc: str, confidence: float) -> str:
     return dec_str
 
 
+def detect_bom_encoding(sample: bytes, default: str = None) -> str:
+    """Text encoding from byte order mark (PS Set-Content writes UTF-16)."""
+    encoding = next((enc for bom, enc in BOM_ENCODINGS
+                     if sample.startswith(bom)), None)
+    return encoding or default or locale.getpreferredencoding(False)
+
+
+def read_file_sample(binary_handle, sample_bytes: int = 4096) -> bytes:
+    """Reads leading bytes of a (possibly non-seekable) binary stream."""
+    sample = b''
+    while len(sample) < sample_bytes:  # streams may return short reads
+        chunk = binary_handle.read(sample_bytes - len(sample))
+        if not chunk:
+            break
+        sample += chunk
+    return sample
+
+
+def iter_guarded_chunks(binary_handle, max_file_bytes: int,
+                        max_seconds: float, chunk_size: int = CHUNK_SIZE,
+                        head: bytes = b''):
+    """Yields binary chunks until max_file_bytes, TimeoutError past budget."""
+    # head: bytes already consumed from stream (e.g. read_file_sample())
+    deadline = time.perf_counter() + max_seconds
+    bytes_read = len(head)
+    if head:
+        yield head
+    while bytes_read < max_file_bytes:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"exceeded {max_seconds:0.1f} sec budget "
+                               f"after {bytes_to_readable(bytes_read)}")
+        chunk = binary_handle.read(min(chunk_size,
+                                       max_file_bytes - bytes_read))
+        if not chunk:
+            break
+        bytes_read += len(chunk)
+        yield chunk
+
+
+def iter_guarded_lines(binary_handle, encoding: str, max_line_bytes: int,
+                       max_file_bytes: int, max_seconds: float,
+                       head: bytes = b''):
+    """Yields decoded lines, overlong lines truncated to max_line_bytes."""
+    # incremental decoding: no seek() needed, multi-byte chars may straddle
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    is_skipping = False  # discarding remainder of an overlong line
+    for chunk in iter_guarded_chunks(binary_handle, max_file_bytes,
+                                     max_seconds, head=head):
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()  # incomplete last line
+        for line in lines:
+            if is_skipping:
+                is_skipping = False
+                continue
+            yield f"{line.rstrip(chr(13))[:max_line_bytes]}\n"
+        if len(pending) > max_line_bytes:
+            if not is_skipping:
+                yield f"{pending[:max_line_bytes]}\n"
+            is_skipping = True
+            pending = ''
+    pending += decoder.decode(b'', final=True)
+    if pending and not is_skipping:
+        yield pending[:max_line_bytes]
+
+
 def get_sha256_hash(input_path: pathlib.Path) -> str:
     """Returns SHA1 hash value of input filepath."""
     sha_hex = 'no hash'
@@ -146,13 +225,9 @@ def get_directory_size(input_path: pathlib.Path,
     show_methods(inspect.currentframe().f_code.co_name)
     if isinstance(input_path, pathlib.Path) and input_path:
         if input_path.exists():
-            if recursive:
-                r_file_sizes = [f.stat().st_size for f in input_path.rglob('*')
-                                if f.is_file()]
-            else:
-                r_file_sizes = [f.stat().st_size for f in input_path.glob('*')
-                                if f.is_file()]
-            return sum(r_file_sizes)
+            # DirEntry.stat() is cached (no extra syscall on Windows)
+            return sum(entry.stat(follow_symlinks=False).st_size for entry in
+                       scan_entries(input_path, recursive=recursive))
     return 0
 
 
@@ -172,9 +247,8 @@ def split_path(input_path: pathlib.Path) -> tuple:
 def is_config_in_path(input_path: pathlib.Path) -> bool:
     """Returns true if all directories to avoid are not in input_path."""
     if isinstance(input_path, pathlib.Path) and input_path:
-        avoid_dirs = ['.git', '.idea', '.pytest_cache', 'venv',
-                      '__pycache__', '__init__']
-        path_hit = next((s for s in avoid_dirs if s in input_path), 'VALID')
+        path_hit = next((s for s in AVOID_DIRS if s in input_path.parts),
+                        'VALID')
         if path_hit == 'VALID':
             return True
     return False
@@ -236,14 +310,30 @@ def save_output_txt(out_path: str, output_filename: str, output_str: str,
     return status
 
 
+def save_output_csv(output_path: pathlib.Path, tag_list: list,
+                    append: bool = True) -> int:
+    """Writes rows (first row = headers) to .csv, header only once."""
+    output_path = pathlib.Path(output_path)
+    is_new = not append or not output_path.exists() or \
+        output_path.stat().st_size == 0
+    if not output_path.parent.exists():
+        os.makedirs(str(output_path.parent))
+    # 'w'=write, 'a'=append, newline='' lets csv module handle line endings
+    with open(str(output_path), 'a' if append else 'w',
+              encoding='utf-8', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        if is_new:
+            csv_writer.writerow(tag_list[0])
+        csv_writer.writerows(tag_list[1:])
+    return len(tag_list) - 1
+
+
 def count_files(input_path: pathlib.Path, file_ext: str = '.mp3') -> int:
     """Returns recursive count of files with specific extension."""
     if isinstance(input_path, pathlib.Path) and input_path:
         if input_path.exists():
             if isinstance(file_ext, str) and file_ext:
-                files = [str(p.absolute()) for p in
-                         input_path.rglob(f"*{file_ext}") if p.is_file()]
-                return len(files)
+                return sum(1 for _ in scan_entries(input_path, file_ext))
     return 0
 
 
@@ -295,18 +385,105 @@ def get_dir_stats(input_path: pathlib.Path) -> list:
     return dir_size_list
 
 
+def _sort_key(entry: os.DirEntry) -> str:
+    """Per-directory ordering matching sorted(pathlib.Path) comparisons."""
+    return entry.name.lower() if IS_WINDOWS else entry.name
+
+
+def scan_entries(input_path: pathlib.Path, file_ext='',
+                 recursive: bool = True, want_dirs: bool = False,
+                 exclude_dirs=None, sort: bool = False,
+                 min_mtime: float = None):
+    """Lazily yields os.DirEntry of files (or dirs) via os.scandir."""
+    # file_ext: str or tuple of str suffixes, '' matches all files
+    # exclude_dirs: directory name prefixes pruned (with AVOID_DIRS)
+    # sort: per-directory name order, same overall order as sorted(rglob())
+    # min_mtime: skip files modified before, and files of directories not
+    #   modified since (no entries created there), sub-dirs still walked
+    prune_dirs = tuple(AVOID_DIRS)
+    prune_prefixes = tuple(exclude_dirs or ())
+    if IS_WINDOWS:
+        file_ext = file_ext.lower() if isinstance(file_ext, str) else \
+            tuple(ext.lower() for ext in file_ext)
+    stack = []
+    is_stale = []  # per open directory: mtime < min_mtime
+
+    def open_dir(dir_path: str, dir_mtime: float):
+        try:
+            scandir_it = os.scandir(dir_path)
+        except (OSError, PermissionError) as exc:
+            print(f"\nERROR: {sys.exc_info()[0]}\n{exc}")
+            return
+        if sort:
+            with scandir_it:
+                stack.append(iter(sorted(scandir_it, key=_sort_key)))
+        else:
+            stack.append(scandir_it)
+        is_stale.append(min_mtime is not None and dir_mtime < min_mtime)
+
+    def get_mtime(entry) -> float:
+        if min_mtime is None:
+            return 0.0
+        return entry.stat(follow_symlinks=False).st_mtime
+
+    open_dir(str(input_path), os.stat(str(input_path)).st_mtime
+             if min_mtime is not None else 0.0)
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            dir_it = stack.pop()
+            is_stale.pop()
+            if hasattr(dir_it, 'close'):
+                dir_it.close()
+            continue
+        # DirEntry type info comes from the directory listing (no stat)
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name in prune_dirs or \
+                    (prune_prefixes and entry.name.startswith(prune_prefixes)):
+                continue
+            if want_dirs:
+                yield entry
+            if recursive:
+                open_dir(entry.path, get_mtime(entry))
+        elif not want_dirs and not is_stale[-1] and entry.is_file():
+            name = entry.name.lower() if IS_WINDOWS else entry.name
+            if name.endswith(file_ext):
+                if min_mtime is None or get_mtime(entry) >= min_mtime:
+                    yield entry
+
+
+def iter_files(input_path: pathlib.Path, file_ext='',
+               recursive: bool = True, exclude_dirs=None,
+               sort: bool = False, min_mtime: float = None):
+    """Yields absolute file paths as they are found (sort: per directory)."""
+    if isinstance(input_path, pathlib.Path) and input_path.is_dir():
+        abs_path = input_path.absolute()
+        for entry in scan_entries(abs_path, file_ext, recursive,
+                                  exclude_dirs=exclude_dirs, sort=sort,
+                                  min_mtime=min_mtime):
+            yield pathlib.Path(entry.path)
+
+
+def iter_directories(input_path: pathlib.Path, recursive: bool = True,
+                     exclude_dirs=None, sort: bool = False):
+    """Yields absolute directory paths as they are found."""
+    if isinstance(input_path, pathlib.Path) and input_path.is_dir():
+        abs_path = input_path.absolute()
+        for entry in scan_entries(abs_path, recursive=recursive,
+                                  want_dirs=True, exclude_dirs=exclude_dirs,
+                                  sort=sort):
+            yield pathlib.Path(entry.path)
+
+
 def get_directories(input_path: pathlib.Path,
                     recursive: bool = True) -> list:
     """Returns recursive set of all directories within input path."""
+    dir_list = []
     if isinstance(input_path, pathlib.Path) and input_path:
         if input_path.exists():
-            if recursive:
-                dir_list = [p.absolute() for p in
-                            sorted(input_path.rglob(f"*")) if p.is_dir()]
-            else:
-                dir_list = [p.absolute() for p in
-                            sorted(input_path.glob(f"*")) if p.is_dir()]
-    return sorted(dir_list)
+            dir_list = list(iter_directories(input_path, recursive,
+                                             sort=True))
+    return dir_list
 
 
 def get_files(input_path: pathlib.Path, file_ext: str,
@@ -315,14 +492,8 @@ def get_files(input_path: pathlib.Path, file_ext: str,
     file_path_list = []
     if isinstance(input_path, pathlib.Path) and isinstance(file_ext, str):
         if input_path.exists():
-            if recursive:
-                file_path_list = [p.absolute() for p in
-                                  sorted(input_path.rglob(f"*{file_ext}"))
-                                  if p.is_file()]
-            else:
-                file_path_list = [p.absolute() for p in
-                                  sorted(input_path.glob(f"*{file_ext}"))
-                                  if p.is_file()]
+            file_path_list = list(iter_files(input_path, file_ext,
+                                             recursive, sort=True))
     return file_path_list
 
 
@@ -331,12 +502,7 @@ def get_extensions(input_path: pathlib.Path,
     """Returns recursive set of all file extensions within input path."""
     if isinstance(input_path, pathlib.Path) and input_path:
         if input_path.exists():
-            if recursive:
-                ext_list = [str(p.suffix) for p in
-                            input_path.rglob(f"*") if p.is_file()]
-            else:
-                ext_list = [str(p.suffix) for p in
-                            input_path.glob(f"*") if p.is_file()]
-            ext_set = set(ext_list)
+            ext_set = set(pathlib.PurePath(entry.name).suffix for entry in
+                          scan_entries(input_path, recursive=recursive))
             return sorted(ext_set)
     return None
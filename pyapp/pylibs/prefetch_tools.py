@@ -0,0 +1,132 @@
+# -*- coding: UTF-8 -*-
+"""Read-ahead prefetching of file heads for high-latency network shares."""
+import collections
+import math
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ['PrefetchedFile', 'read_file_head', 'get_prefetch_depth',
+           'iter_prefetched']
+
+HEAD_BYTES = 64 * 1024  # typical tag dump is read in a single request
+MIN_DEPTH = 1
+MAX_DEPTH = 64
+EWMA_WEIGHT = 0.2  # weight of latest sample in moving averages
+
+
+class PrefetchedFile:
+    """Binary file object served from a prefetched head, then from disk."""
+
+    def __init__(self, file_path: pathlib.Path, head: bytes,
+                 is_complete: bool, error: OSError = None):
+        self.file_path = file_path
+        self.head = head
+        self.is_complete = is_complete  # head holds the entire file
+        self.error = error  # deferred: raised on read like open() would
+        self.position = 0
+        self.tail_handle = None
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads from head, tail is only opened if read past the head."""
+        if self.error is not None:
+            raise self.error
+        if size is None or size < 0:
+            data = self.head[self.position:]
+            tail_size = -1
+        else:
+            data = self.head[self.position:self.position + size]
+            tail_size = size - len(data)
+        self.position += len(data)
+        if tail_size != 0 and not self.is_complete:
+            if self.tail_handle is None:
+                self.tail_handle = open(str(self.file_path), 'rb')
+                self.tail_handle.seek(len(self.head))
+            tail = self.tail_handle.read(tail_size)
+            self.position += len(tail)
+            data += tail
+        return data
+
+    def tell(self) -> int:
+        """Returns current read position in file."""
+        return self.position
+
+    def close(self) -> None:
+        """Closes tail handle, if the file was read past its head."""
+        if self.tail_handle is not None:
+            self.tail_handle.close()
+            self.tail_handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_file_head(file_path: pathlib.Path,
+                   head_bytes: int = HEAD_BYTES) -> tuple:
+    """Worker: one open/read/close of leading bytes, returns (head, EOF)."""
+    with open(str(file_path), 'rb') as read_handle:
+        head = read_handle.read(head_bytes)
+    return head, len(head) < head_bytes
+
+
+def _timed_read(read_func, file_path: pathlib.Path, head_bytes: int) -> tuple:
+    """Runs read_func in worker thread, returns (result, error, seconds)."""
+    start_time = time.perf_counter()
+    try:
+        result, error = read_func(file_path, head_bytes), None
+    except OSError as exp:
+        result, error = (b'', True), exp
+    return result, error, time.perf_counter() - start_time
+
+
+def get_prefetch_depth(read_seconds: float, parse_seconds: float,
+                       max_depth: int = MAX_DEPTH) -> int:
+    """Reads in flight to hide read latency behind parsing (Little's law)."""
+    depth = math.ceil(read_seconds / max(parse_seconds, 1e-6)) + 1
+    return max(MIN_DEPTH, min(depth, max_depth))
+
+
+def iter_prefetched(file_paths, head_bytes: int = HEAD_BYTES,
+                    depth: int = 8, max_depth: int = MAX_DEPTH,
+                    read_func=read_file_head):
+    """Yields (file_path, PrefetchedFile) in input order, reads ahead."""
+    # depth: initial reads in flight, adapted to observed read vs parse time
+    # (0: no read-ahead, each file read when the parser asks for it)
+    path_iter = iter(file_paths)
+    if depth <= 0:
+        for file_path in path_iter:
+            (head, is_complete), error, _ = _timed_read(
+                read_func, file_path, head_bytes)
+            yield file_path, PrefetchedFile(file_path, head, is_complete,
+                                            error)
+        return
+    pending = collections.deque()
+    read_seconds = None
+    parse_seconds = None
+    with ThreadPoolExecutor(max_workers=max_depth) as executor:
+        is_exhausted = False
+        while True:
+            while not is_exhausted and len(pending) < depth:
+                file_path = next(path_iter, None)
+                if file_path is None:
+                    is_exhausted = True
+                    break
+                pending.append((file_path, executor.submit(
+                    _timed_read, read_func, file_path, head_bytes)))
+            if not pending:
+                break
+            file_path, future = pending.popleft()
+            (head, is_complete), error, seconds = future.result()
+            read_seconds = seconds if read_seconds is None else \
+                EWMA_WEIGHT * seconds + (1 - EWMA_WEIGHT) * read_seconds
+            parse_start = time.perf_counter()
+            yield file_path, PrefetchedFile(file_path, head, is_complete,
+                                            error)
+            seconds = time.perf_counter() - parse_start
+            parse_seconds = seconds if parse_seconds is None else \
+                EWMA_WEIGHT * seconds + (1 - EWMA_WEIGHT) * parse_seconds
+            depth = get_prefetch_depth(read_seconds, parse_seconds,
+                                       max_depth)
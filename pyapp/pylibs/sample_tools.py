@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+"""Reservoir/per-folder stratified dump samples and estimated counts."""
+import math
+import random
+from collections import Counter
+from collections import defaultdict
+
+__all__ = ['SAMPLE_MODES', 'ESTIMATE_COLUMNS', 'get_stratum',
+           'sample_items', 'estimate_counts']
+
+# reservoir: one uniform sample, folder: sample size per top level folder
+SAMPLE_MODES = ('reservoir', 'folder')
+ESTIMATE_COLUMNS = ['modality', 'sourceApplicationEntityTitle',
+                    'transferSyntaxUid']
+Z_95 = 1.959964  # two-sided 95% normal quantile
+
+
+def get_stratum(rel_parts: tuple) -> str:
+    """Top level folder of a dump path relative to its input, '' if loose."""
+    return rel_parts[0] if len(rel_parts) > 1 else ''
+
+
+def sample_items(stratified_items, sample_size: int,
+                 sample_mode: str = 'reservoir', seed=None) -> dict:
+    """Single pass reservoir sample(s): {stratum: [population, items]}."""
+    # stratified_items: (stratum, item) as discovered, never held in memory
+    rng = random.Random(seed)
+    strata = defaultdict(lambda: [0, []])
+    for stratum, item in stratified_items:
+        if sample_mode == 'reservoir':
+            stratum = ''
+        reservoir = strata[stratum]
+        reservoir[0] += 1
+        if len(reservoir[1]) < sample_size:
+            reservoir[1].append(item)
+        else:  # Algorithm R: keeps each item with p = size / population
+            slot = rng.randrange(reservoir[0])
+            if slot < sample_size:
+                reservoir[1][slot] = item
+    return dict(strata)
+
+
+def estimate_counts(strata_rows: dict, headers: list,
+                    columns: list = None, z_score: float = Z_95) -> list:
+    """Estimated population count per column value with confidence range."""
+    # strata_rows: {stratum: (population, sampled rows)}, [] for non-dumps
+    # returns [column, value, sampled, estimate, low, high], first headers
+    columns = columns or ESTIMATE_COLUMNS
+    col_idx = [(col, headers.index(col)) for col in columns]
+    sampled = Counter()
+    estimates = Counter()
+    variances = Counter()
+    population_total = 0
+    for population, rows in strata_rows.values():
+        population_total += population
+        if not rows:
+            continue
+        value_counts = Counter()
+        for row in rows:
+            if row:
+                value_counts[('dumps', 'parsed')] += 1
+                value_counts.update((col, row[idx]) for col, idx in col_idx)
+        # stratified total: sum of N * p, variance with finite population
+        # correction (census strata: no error; single sample: p(1-p) <= 1/4)
+        fpc = 1 - len(rows) / population
+        for key, count in value_counts.items():
+            ratio = count / len(rows)
+            sampled[key] += count
+            estimates[key] += population * ratio
+            if len(rows) > 1:
+                variances[key] += population ** 2 * fpc * ratio * \
+                    (1 - ratio) / (len(rows) - 1)
+            else:
+                variances[key] += population ** 2 * fpc * 0.25
+    estimate_list = []
+    for (col, value), estimate in estimates.items():
+        margin = z_score * math.sqrt(variances[(col, value)])
+        # a sampled dump is known to exist: low bound >= sampled count
+        estimate_list.append(
+            [col, value, sampled[(col, value)], round(estimate),
+             max(sampled[(col, value)], math.floor(estimate - margin)),
+             min(population_total, math.ceil(estimate + margin))])
+    col_order = ['dumps'] + columns
+    estimate_list.sort(key=lambda row: (col_order.index(row[0]), -row[3],
+                                        row[1]))
+    return [['column', 'value', 'sampled', 'estimate', 'low', 'high']] + \
+        estimate_list
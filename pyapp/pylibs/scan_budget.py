@@ -0,0 +1,122 @@
+# -*- coding: UTF-8 -*-
+"""Priority-ordered, time-budgeted scan plan with resumable state."""
+import csv
+import heapq
+import json
+import os
+import pathlib
+import time
+from . import file_tools
+
+__all__ = ['get_aet_rank', 'iter_scan_items', 'build_scan_heap',
+           'load_scan_state', 'reset_scan_state', 'save_scan_state',
+           'load_scan_rows', 'iter_budget_items', 'build_coverage_list']
+
+
+def get_aet_rank(item_name: str, priority_aets: list = None) -> int:
+    """Index of first matching AET prefix, after all prefixes if none."""
+    priority_aets = priority_aets or []
+    return next((rank for rank, aet in enumerate(priority_aets)
+                 if item_name.startswith(aet)), len(priority_aets))
+
+
+def iter_scan_items(input_dirs: list, archive_paths: list,
+                    exclude_dirs=None):
+    """Yields (item path, is_recursive) units of work: study folders."""
+    for input_path in input_dirs:
+        # loose dumps directly in an input directory form their own item
+        if next(file_tools.iter_files(input_path, ('.txt', '.xml'),
+                                      recursive=False), None) is not None:
+            yield input_path, False
+        for study_path in file_tools.iter_directories(
+                input_path, recursive=False, exclude_dirs=exclude_dirs):
+            yield study_path, True
+    for archive_path in archive_paths:
+        yield archive_path, False
+
+
+def build_scan_heap(scan_items, priority_aets: list = None,
+                    done_keys=frozenset()) -> tuple:
+    """Returns (heap of chosen AETs first then newest, skipped count)."""
+    # heap entries: (aet rank, -mtime, item key, item path, is_recursive)
+    scan_heap = []
+    skip_count = 0
+    for item_path, is_recursive in scan_items:
+        item_key = str(item_path)
+        if item_key in done_keys:
+            skip_count += 1
+            continue
+        try:
+            item_mtime = os.stat(item_key).st_mtime
+        except OSError:
+            item_mtime = 0.0
+        scan_heap.append((get_aet_rank(item_path.name, priority_aets),
+                          -item_mtime, item_key, item_path, is_recursive))
+    heapq.heapify(scan_heap)
+    return scan_heap, skip_count
+
+
+def load_scan_state(state_path: pathlib.Path, input_paths: list) -> set:
+    """Item keys done by earlier budgeted runs over the same inputs."""
+    # state file: JSON list of inputs, then one done item key per line
+    try:
+        with open(str(state_path), 'r', encoding='utf-8') as state_file:
+            if json.loads(state_file.readline() or 'null') != \
+                    [str(p) for p in input_paths]:
+                return set()  # different scan: start over
+            return set(line.rstrip('\n') for line in state_file
+                       if line.strip())
+    except (OSError, ValueError):
+        return set()
+
+
+def reset_scan_state(state_path: pathlib.Path, rows_path: pathlib.Path,
+                     input_paths: list) -> None:
+    """Starts a new scan: state header only, no rows of earlier scans."""
+    if rows_path.is_file():
+        os.remove(str(rows_path))
+    with open(str(state_path), 'w', encoding='utf-8') as state_file:
+        state_file.write(json.dumps([str(p) for p in input_paths]) + '\n')
+
+
+def save_scan_state(state_path: pathlib.Path, item_key: str) -> None:
+    """Appends a done item (killed runs lose at most the current item)."""
+    with open(str(state_path), 'a', encoding='utf-8') as state_file:
+        state_file.write(f"{item_key}\n")
+
+
+def load_scan_rows(rows_path: pathlib.Path) -> list:
+    """Rows (without header) saved by earlier runs of the same scan."""
+    if not rows_path.is_file():
+        return []
+    with open(str(rows_path), 'r', newline='', encoding='utf-8') as csv_file:
+        return list(csv.reader(csv_file))[1:]
+
+
+def iter_budget_items(scan_heap: list, max_seconds: float,
+                      start_time: float = None):
+    """Pops heap items while the budget lasts, the first item always."""
+    # start_time: budget start (incl. discovery), default first item start
+    # item average excludes discovery: slow walks still process an item
+    items_start = time.perf_counter()
+    start_time = items_start if start_time is None else start_time
+    item_count = 0
+    while scan_heap:
+        now = time.perf_counter()
+        # stop before an item that would likely overrun the budget
+        item_seconds = (now - items_start) / item_count if item_count \
+            else 0.0
+        if item_count and now - start_time + item_seconds > max_seconds:
+            return
+        yield heapq.heappop(scan_heap)
+        item_count += 1
+
+
+def build_coverage_list(processed: list, skipped: list,
+                        remaining: list) -> list:
+    """Coverage summary rows: [status, items, dumps], first row headers."""
+    # each argument: [item count, dump count]
+    return [['status', 'items', 'dumps'],
+            ['processed'] + list(processed),
+            ['skipped'] + list(skipped),
+            ['remaining'] + list(remaining)]
@@ -0,0 +1,178 @@
+# -*- coding: UTF-8 -*-
+"""Stable hash sharding of study folders, partial results and merge."""
+import csv
+import datetime
+import hashlib
+import json
+import pathlib
+import platform
+import sys
+from collections import Counter
+from . import scan_budget
+
+__all__ = ['SHARD_TAG', 'parse_shard_arg', 'get_shard', 'get_sort_name',
+           'iter_shard_items', 'get_shard_paths', 'write_shard',
+           'find_manifests', 'merge_shards']
+
+IS_WINDOWS = sys.platform.startswith('win')
+SHARD_TAG = 'dicom_tag_shard'
+ORDER_HEADER = 'shardOrder'
+# manifest values every shard of one run must agree on
+MATCH_KEYS = ['shards', 'inputs', 'headers', 'date_window', 'exclude_aets']
+
+
+def parse_shard_arg(shard_str: str) -> tuple:
+    """Parses 'i/N' (shard i of N, 1 based) into (i, N)."""
+    shard_num, shard_count = (int(val) for val in shard_str.split('/'))
+    if not 1 <= shard_num <= shard_count:
+        raise ValueError(f"shard not in 1..N: '{shard_str}'")
+    return shard_num, shard_count
+
+
+def get_shard(shard_key: str, shard_count: int) -> int:
+    """Shard (1 based) of an item key: same on every host and process."""
+    # hash() of str is salted per process, sha1 is stable
+    digest = hashlib.sha1(shard_key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count + 1
+
+
+def get_sort_name(name: str) -> str:
+    """Name order of a sorted directory walk (file_tools.scan_entries)."""
+    return name.lower() if IS_WINDOWS else name
+
+
+def iter_shard_items(input_dirs: list, archive_paths: list,
+                     exclude_dirs=None):
+    """Yields (shard key, order prefix, item path, is_recursive) per item."""
+    # shard key: item path below the parent of its input, host independent
+    # order prefix: [0, input num, study folder] or [1, archive num, '']
+    for input_num, input_path in enumerate(input_dirs):
+        for item_path, is_recursive in scan_budget.iter_scan_items(
+                [input_path], [], exclude_dirs):
+            folder_name = item_path.name if is_recursive else ''
+            yield f"{input_path.name}/{folder_name}", \
+                [0, input_num, folder_name], item_path, is_recursive
+    abs_dirs = [input_path.absolute() for input_path in input_dirs]
+    for archive_num, archive_path in enumerate(archive_paths):
+        abs_archive = archive_path.absolute()
+        shard_key = next((abs_archive.relative_to(abs_dir.parent).as_posix()
+                          for abs_dir in abs_dirs
+                          if abs_dir in abs_archive.parents),
+                         archive_path.name)
+        yield shard_key, [1, archive_num, ''], archive_path, False
+
+
+def get_shard_paths(output_path: pathlib.Path, shard_num: int,
+                    shard_count: int, temp_tag: str = '~') -> tuple:
+    """Returns (partial rows .csv path, manifest .json path) of a shard."""
+    base_name = f"{temp_tag}{SHARD_TAG}_{shard_num:03}of{shard_count:03}"
+    return pathlib.Path(output_path, f"{base_name}.csv"), \
+        pathlib.Path(output_path, f"{base_name}.json")
+
+
+def _hash_file(file_path: pathlib.Path) -> str:
+    """Returns sha256 hex digest of a file."""
+    sha = hashlib.sha256()
+    with open(str(file_path), 'rb') as hash_file:
+        for chunk in iter(lambda: hash_file.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def write_shard(partial_path: pathlib.Path, manifest_path: pathlib.Path,
+                headers: list, order_rows: list, quarantine_rows: list,
+                manifest: dict) -> dict:
+    """Writes partial rows (+ order column) .csv, then its manifest."""
+    # order_rows: [order key, row], quarantine_rows: [order key, file, reason]
+    # manifest written last: a partial without manifest is never merged
+    with open(str(partial_path), 'w', encoding='utf-8', newline='') as \
+            csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(list(headers) + [ORDER_HEADER])
+        for order_key, row in order_rows:
+            csv_writer.writerow(list(row) + [json.dumps(order_key)])
+    manifest = dict(manifest, headers=list(headers),
+                    partial=partial_path.name,
+                    sha256=_hash_file(partial_path), rows=len(order_rows),
+                    quarantine=quarantine_rows, host=platform.node(),
+                    created=datetime.datetime.now().isoformat(
+                        timespec='seconds'))
+    with open(str(manifest_path), 'w', encoding='utf-8') as json_file:
+        json.dump(manifest, json_file, indent=1)
+    return manifest
+
+
+def find_manifests(input_paths: list) -> list:
+    """Shard manifests: given .json files and those found in directories."""
+    manifest_paths = []
+    for input_path in input_paths:
+        if input_path.is_dir():
+            manifest_paths.extend(sorted(input_path.glob(
+                f"*{SHARD_TAG}_*of*.json")))
+        else:
+            manifest_paths.append(input_path)
+    return manifest_paths
+
+
+def _get_order(order_key: list) -> tuple:
+    """Sort key of a stored order key, as a single sorted walk orders."""
+    phase, item_num, name, seq = order_key
+    return phase, item_num, get_sort_name(name), seq
+
+
+def _load_manifests(manifest_paths: list) -> list:
+    """Loads and checks manifests: one complete set of N shards."""
+    manifests = []
+    for manifest_path in manifest_paths:
+        with open(str(manifest_path), 'r', encoding='utf-8') as json_file:
+            manifest = json.load(json_file)
+        manifest['partial_path'] = pathlib.Path(manifest_path.parent,
+                                                manifest['partial'])
+        manifests.append(manifest)
+    if not manifests:
+        raise ValueError("no shard manifests found")
+    for manifest in manifests[1:]:
+        for key in MATCH_KEYS:
+            if manifest[key] != manifests[0][key]:
+                raise ValueError(f"shards of different runs: '{key}' "
+                                 f"{manifest[key]} != {manifests[0][key]}")
+    shard_nums = sorted(manifest['shard'] for manifest in manifests)
+    shard_count = manifests[0]['shards']
+    duplicates = sorted(shard_num for shard_num, count in
+                        Counter(shard_nums).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"duplicate shard {', '.join(map(str, duplicates))}"
+                         f" of {shard_count}")
+    if shard_nums != list(range(1, shard_count + 1)):
+        missing = sorted(set(range(1, shard_count + 1)) - set(shard_nums))
+        raise ValueError(f"incomplete shard set of {shard_count}: "
+                         f"shards {shard_nums}, missing {missing}")
+    for manifest in manifests:
+        if _hash_file(manifest['partial_path']) != manifest['sha256']:
+            raise ValueError(f"partial changed since manifest: "
+                             f"'{manifest['partial_path']}'")
+    return sorted(manifests, key=lambda manifest: manifest['shard'])
+
+
+def merge_shards(manifest_paths: list) -> tuple:
+    """Returns (tag list, quarantine list, manifests) in single run order."""
+    manifests = _load_manifests(manifest_paths)
+    order_rows = []
+    quarantine_rows = []
+    for manifest in manifests:
+        with open(str(manifest['partial_path']), 'r', encoding='utf-8',
+                  newline='') as csv_file:
+            csv_reader = csv.reader(csv_file)
+            next(csv_reader, None)  # headers
+            for row in csv_reader:
+                order_rows.append((_get_order(json.loads(row[-1])),
+                                   row[:-1]))
+        quarantine_rows.extend((_get_order(order_key), [file_name, reason])
+                               for order_key, file_name, reason in
+                               manifest['quarantine'])
+    order_rows.sort(key=lambda order_row: order_row[0])
+    quarantine_rows.sort(key=lambda order_row: order_row[0])
+    tag_list = [manifests[0]['headers']] + [row for _, row in order_rows]
+    quarantine_list = [['filename', 'reason']] + \
+        [row for _, row in quarantine_rows]
+    return tag_list, quarantine_list, manifests
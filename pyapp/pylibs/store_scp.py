@@ -0,0 +1,186 @@
+# -*- coding: UTF-8 -*-
+"""DICOM C-STORE SCP that extracts report rows from received datasets."""
+import pathlib
+import queue
+import threading
+try:
+    from pynetdicom import AE, evt, AllStoragePresentationContexts
+    from pynetdicom import ALL_TRANSFER_SYNTAXES, build_context
+    from pynetdicom.sop_class import Verification
+except ImportError:  # optional: only required for listener mode
+    AE = None
+from . import dicom_tools
+from . import file_tools
+from . import transfer_store
+
+__all__ = ['parse_forward_addr', 'build_dataset_row', 'start_store_scp',
+           'stop_store_scp']
+
+STATUS_SUCCESS = 0x0000
+STATUS_CANNOT_UNDERSTAND = 0xC000
+# presentation states/structured reports: not representative of transfer
+SKIP_MODALITIES = ('PR', 'SR')
+FLUSH_SIZE = 100  # rows buffered by writer before each sink flush
+FLUSH_SECONDS = 1.0
+MAX_CONTEXTS = 128  # presentation contexts proposed per association
+
+
+def parse_forward_addr(forward_str: str) -> tuple:
+    """Parses 'AET@host:port' into (ae_title, host, port)."""
+    ae_title, host_port = forward_str.split('@', 1)
+    host, port = host_port.rsplit(':', 1)
+    return ae_title, host, int(port)
+
+
+def build_dataset_row(dataset, sop_instance_uid: str) -> list:
+    """Returns HEADERS ordered values extracted from in-memory dataset."""
+    elements = dicom_tools.build_keyword_tag_dict(sop_instance_uid)
+    tag_dict = dicom_tools.extract_dataset_tags(dataset, elements)
+    return [tag_dict[hdr] for hdr in dicom_tools.HEADERS]
+
+
+def get_forward_contexts(accepted_contexts) -> list:
+    """Incoming association's accepted contexts, proposed when forwarding."""
+    # each dataset is forwarded in the transfer syntax it was received in
+    forward_contexts = []
+    context_keys = set()
+    for context in accepted_contexts:
+        context_key = (context.abstract_syntax, context.transfer_syntax[0])
+        if context_key not in context_keys:
+            context_keys.add(context_key)
+            forward_contexts.append(build_context(*context_key))
+    return forward_contexts[:MAX_CONTEXTS]
+
+
+def get_forward_assoc(event, forward_addr: tuple, forward_assocs: dict,
+                      calling_aet: str = 'IMG_RTR_RPT'):
+    """One forwarding association per incoming association (reused)."""
+    # only the incoming association's own thread uses its forward assoc
+    forward_assoc = forward_assocs.get(event.assoc.name)
+    if forward_assoc is None or not forward_assoc.is_established:
+        ae_title, host, port = forward_addr
+        forward_ae = AE(ae_title=calling_aet)
+        forward_ae.requested_contexts = get_forward_contexts(
+            event.assoc.accepted_contexts)
+        forward_assoc = forward_ae.associate(host, port, ae_title=ae_title)
+        forward_assocs[event.assoc.name] = forward_assoc
+    return forward_assoc
+
+
+def forward_dataset(dataset, forward_assoc) -> int:
+    """Sends received dataset onward to another C-STORE SCP."""
+    if not forward_assoc.is_established:
+        return STATUS_CANNOT_UNDERSTAND
+    try:
+        response = forward_assoc.send_c_store(dataset)
+    except (AttributeError, ValueError) as exp:  # no matching context
+        print(f"~!ERROR!~ forward: {type(exp).__name__}: {exp}")
+        return STATUS_CANNOT_UNDERSTAND
+    return getattr(response, 'Status', STATUS_CANNOT_UNDERSTAND)
+
+
+def handle_store(event, row_queue: queue.Queue, seen_studies: dict,
+                 seen_lock: threading.Lock, forward_addr: tuple,
+                 forward_assocs: dict) -> int:
+    """EVT_C_STORE: extract one row per study, pixel data never written."""
+    try:
+        # decoded lazily: only the accessed elements are converted
+        dataset = event.dataset
+        dataset.file_meta = event.file_meta
+        dataset.file_meta.SourceApplicationEntityTitle = \
+            event.assoc.requestor.ae_title
+    except (AttributeError, ValueError, EOFError):
+        return STATUS_CANNOT_UNDERSTAND
+    study_uid = str(dataset.get('StudyInstanceUID', ''))
+    modality = str(dataset.get('Modality', ''))
+    with seen_lock:
+        assoc_studies = seen_studies.setdefault(event.assoc.name, set())
+        is_first = study_uid not in assoc_studies and \
+            modality not in SKIP_MODALITIES
+        if is_first:
+            assoc_studies.add(study_uid)
+    if is_first:
+        row_queue.put(build_dataset_row(
+            dataset, event.request.AffectedSOPInstanceUID))
+    if forward_addr is not None:
+        return forward_dataset(dataset, get_forward_assoc(
+            event, forward_addr, forward_assocs))
+    return STATUS_SUCCESS
+
+
+def handle_close(event, seen_studies: dict, seen_lock: threading.Lock,
+                 forward_assocs: dict) -> None:
+    """EVT_CONN_CLOSE: forget studies, release forwarding association."""
+    with seen_lock:
+        seen_studies.pop(event.assoc.name, None)
+        forward_assoc = forward_assocs.pop(event.assoc.name, None)
+    if forward_assoc is not None and forward_assoc.is_established:
+        forward_assoc.release()
+
+
+def write_rows(row_queue: queue.Queue, csv_path: pathlib.Path = None,
+               store_path: pathlib.Path = None) -> None:
+    """Single writer thread: drains queued rows into CSV/SQLite sinks."""
+    conn = None
+    if store_path is not None:
+        conn = transfer_store.open_store(store_path)
+    is_running = True
+    while is_running:
+        batch = []
+        try:
+            row = row_queue.get(timeout=FLUSH_SECONDS)
+            while row is not None:
+                batch.append(row)
+                if len(batch) >= FLUSH_SIZE:
+                    break
+                row = row_queue.get_nowait()
+            is_running = row is not None
+        except queue.Empty:
+            pass
+        if batch:
+            tag_list = [dicom_tools.HEADERS] + batch
+            if csv_path is not None:
+                file_tools.save_output_csv(csv_path, tag_list)
+            if conn is not None:
+                transfer_store.load_rows(conn, tag_list)
+    if conn is not None:
+        conn.close()
+
+
+def start_store_scp(ae_title: str, port: int, address: str = '',
+                    csv_path: pathlib.Path = None,
+                    store_path: pathlib.Path = None,
+                    forward_addr: tuple = None) -> tuple:
+    """Starts threaded (one per association) SCP and sink writer thread."""
+    if AE is None:
+        raise ImportError("'pynetdicom' package required for listener mode")
+    row_queue = queue.Queue()
+    writer = threading.Thread(target=write_rows,
+                              args=(row_queue, csv_path, store_path),
+                              daemon=True)
+    writer.start()
+    seen_studies = {}
+    forward_assocs = {}  # incoming association name: forward association
+    seen_lock = threading.Lock()
+    scp_ae = AE(ae_title=ae_title)
+    # router traffic is often compressed (JPEG lossless, JPEG 2000)
+    for context in AllStoragePresentationContexts:
+        scp_ae.add_supported_context(context.abstract_syntax,
+                                     ALL_TRANSFER_SYNTAXES)
+    scp_ae.add_supported_context(Verification)
+    handlers = [(evt.EVT_C_STORE, handle_store,
+                 [row_queue, seen_studies, seen_lock, forward_addr,
+                  forward_assocs]),
+                (evt.EVT_CONN_CLOSE, handle_close,
+                 [seen_studies, seen_lock, forward_assocs])]
+    server = scp_ae.start_server((address, port), block=False,
+                                 evt_handlers=handlers)
+    return server, row_queue, writer
+
+
+def stop_store_scp(server, row_queue: queue.Queue,
+                   writer: threading.Thread) -> None:
+    """Stops accepting associations, then flushes remaining rows."""
+    server.shutdown()
+    row_queue.put(None)  # sentinel: writer flushes and exits
+    writer.join()
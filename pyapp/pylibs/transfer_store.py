@@ -0,0 +1,135 @@
+# -*- coding: UTF-8 -*-
+"""Indexed SQLite store for parsed DICOM transfer rows."""
+import pathlib
+import re
+import sqlite3
+from . import dicom_tools
+
+__all__ = ['open_store', 'load_rows', 'count_rows', 'query_transfers',
+           'query_range', 'pivot_transfers', 'sanitize_date']
+
+TABLE_NAME = 'transfers'
+INDEXED_COLUMNS = ['accessionNumber', 'sourceApplicationEntityTitle',
+                   'modality', 'institutionName', 'studyDate']
+# a transfer is identified by its dump and study, so reloads are idempotent
+UNIQUE_COLUMNS = ['filename', 'accessionNumber',
+                  'sourceApplicationEntityTitle', 'studyDate']
+BATCH_SIZE = 1000
+
+
+def sanitize_date(date_str: str) -> str:
+    """DICOM dates do not have hyphens/slashes, just yyyyMMdd numbers."""
+    # separated dates: yyyy-MM-dd / yyyy/MM/dd, or US style MM/dd/yyyy
+    if not date_str:
+        return ''
+    date_parts = re.findall(r'\d+', str(date_str))
+    if len(date_parts) == 3:
+        if len(date_parts[0]) == 4:
+            year, month, day = date_parts
+            return f"{year}{month:0>2}{day:0>2}"
+        if len(date_parts[2]) == 4:
+            month, day, year = date_parts
+            return f"{year}{month:0>2}{day:0>2}"
+    return ''.join(date_parts)
+
+
+def _check_column(column: str) -> str:
+    """Only header names are valid columns (never interpolate user input)."""
+    if column not in dicom_tools.HEADERS:
+        raise ValueError(f"invalid column: '{column}' "
+                         f"expected one of: {dicom_tools.HEADERS}")
+    return f'"{column}"'
+
+
+def open_store(db_path: pathlib.Path) -> sqlite3.Connection:
+    """Opens (creating if needed) transfer table and its indexes."""
+    conn = sqlite3.connect(str(db_path))
+    col_defs = ', '.join(f'"{hdr}" TEXT NOT NULL DEFAULT \'\''
+                         for hdr in dicom_tools.HEADERS)
+    unique_cols = ', '.join(_check_column(col) for col in UNIQUE_COLUMNS)
+    with conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} "
+                     f"({col_defs}, UNIQUE ({unique_cols}))")
+        for column in INDEXED_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{column} "
+                         f"ON {TABLE_NAME} ({_check_column(column)})")
+    return conn
+
+
+def load_rows(conn: sqlite3.Connection, tag_list: list,
+              batch_size: int = BATCH_SIZE) -> int:
+    """Batched inserts of parsed rows (first row = headers) per transaction."""
+    if len(tag_list) < 2:
+        return 0
+    headers = list(tag_list[0])
+    columns = ', '.join(_check_column(hdr) for hdr in headers)
+    params = ', '.join('?' for _ in headers)
+    sql_str = (f"INSERT OR REPLACE INTO {TABLE_NAME} ({columns}) "
+               f"VALUES ({params})")
+    date_idx = headers.index('studyDate') if 'studyDate' in headers else -1
+    row_count = 0
+    for batch_start in range(1, len(tag_list), batch_size):
+        batch = []
+        for tag_row in tag_list[batch_start:batch_start + batch_size]:
+            row = [str(val) for val in tag_row]
+            if date_idx != -1:
+                row[date_idx] = sanitize_date(row[date_idx])
+            batch.append(row)
+        with conn:  # one transaction per batch
+            conn.executemany(sql_str, batch)
+        row_count += len(batch)
+    return row_count
+
+
+def count_rows(conn: sqlite3.Connection) -> int:
+    """Returns number of transfers in store."""
+    return conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+
+
+def _fetch_with_headers(cursor: sqlite3.Cursor) -> list:
+    """Returns result set as list of rows, first row contains headers."""
+    headers = [desc[0] for desc in cursor.description]
+    return [headers] + [list(row) for row in cursor.fetchall()]
+
+
+def query_transfers(conn: sqlite3.Connection, column: str,
+                    value: str, is_like: bool = False) -> list:
+    """Query mode: transfers where column equals (or is LIKE) value."""
+    operator = 'LIKE' if is_like else '='
+    if column == 'studyDate':
+        value = sanitize_date(value)
+    cursor = conn.execute(
+        f"SELECT * FROM {TABLE_NAME} WHERE {_check_column(column)} "
+        f"{operator} ? ORDER BY studyDate, accessionNumber", (value,))
+    return _fetch_with_headers(cursor)
+
+
+def query_range(conn: sqlite3.Connection, since: str = '',
+                until: str = '') -> list:
+    """Range mode: transfers with studyDate within [since, until]."""
+    since = sanitize_date(since) or '00000000'
+    until = sanitize_date(until) or '99999999'
+    cursor = conn.execute(
+        f"SELECT * FROM {TABLE_NAME} WHERE studyDate BETWEEN ? AND ? "
+        f"ORDER BY studyDate, accessionNumber", (since, until))
+    return _fetch_with_headers(cursor)
+
+
+def pivot_transfers(conn: sqlite3.Connection,
+                    row_key: str = 'sourceApplicationEntityTitle',
+                    col_key: str = 'modality') -> list:
+    """Pivot mode: transfer counts of row_key (rows) by col_key (columns)."""
+    row_col = _check_column(row_key)
+    col_col = _check_column(col_key)
+    col_values = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT {col_col} FROM {TABLE_NAME} ORDER BY {col_col}")]
+    pivot_dict = {}
+    for row_val, col_val, count in conn.execute(
+            f"SELECT {row_col}, {col_col}, COUNT(*) FROM {TABLE_NAME} "
+            f"GROUP BY {row_col}, {col_col} ORDER BY {row_col}"):
+        pivot_dict.setdefault(row_val, {})[col_val] = count
+    pivot_list = [[row_key] + col_values + ['total']]
+    for row_val, counts in pivot_dict.items():
+        row_counts = [counts.get(col_val, 0) for col_val in col_values]
+        pivot_list.append([row_val] + row_counts + [sum(row_counts)])
+    return pivot_list
@@ -0,0 +1,81 @@
+import unittest
+import os
+import io
+import pathlib
+import shutil
+import tarfile
+import zipfile
+
+from pyapp.pylibs.archive_tools import *
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+
+class TestArchiveTools(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/archive_tools.py"""
+
+    def setUp(self):
+        self.dump_dir = pathlib.Path(PARENT_PATH, 'input', 'tag_dumps')
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+        self.dump_names = sorted(p.name for p in self.dump_dir.glob('*.txt'))
+        self.zip_path = pathlib.Path(self.out_path, 'dumps.zip')
+        with zipfile.ZipFile(str(self.zip_path), 'w') as zip_handle:
+            for name in self.dump_names:
+                zip_handle.write(str(pathlib.Path(self.dump_dir, name)),
+                                 f"study/{name}")
+            zip_handle.writestr('study/notes.log', 'not a dump')
+        self.tgz_path = pathlib.Path(self.out_path, 'dumps.tar.gz')
+        with tarfile.open(str(self.tgz_path), 'w:gz') as tar_handle:
+            tar_handle.add(str(self.dump_dir), arcname='study')
+
+    def test_get_archive_ext(self):
+        self.assertEqual(get_archive_ext(self.zip_path), '.zip')
+        self.assertEqual(get_archive_ext(self.tgz_path), '.tar.gz')
+        self.assertEqual(get_archive_ext(pathlib.Path('a.TAR.ZST')),
+                         '.tar.zst')
+        self.assertEqual(get_archive_ext(pathlib.Path('a.txt')), '')
+
+    def test_is_archive(self):
+        self.assertTrue(is_archive(self.zip_path))
+        self.assertTrue(is_archive(self.tgz_path))
+        self.assertFalse(is_archive(self.dump_dir))
+        self.assertFalse(is_archive('dumps.zip'))
+
+    def test_iter_archive_members(self):
+        for archive_path in (self.zip_path, self.tgz_path):
+            members = [(name, list(lines)) for name, lines in
+                       iter_archive_members(archive_path, '.txt')]
+            self.assertEqual(sorted(os.path.basename(name)
+                                    for name, _ in members),
+                             self.dump_names)
+            for name, lines in members:
+                self.assertIsInstance(lines[0], str)
+                src = pathlib.Path(self.dump_dir, os.path.basename(name))
+                with open(str(src), 'r', encoding='utf-8',
+                          errors='replace') as src_handle:
+                    self.assertEqual(len(lines), len(src_handle.readlines()))
+
+    def test_iter_archive_members_zst(self):
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest("'zstandard' not installed")
+        tar_bytes = io.BytesIO()
+        with tarfile.open(fileobj=tar_bytes, mode='w') as tar_handle:
+            tar_handle.add(str(self.dump_dir), arcname='study')
+        zst_path = pathlib.Path(self.out_path, 'dumps.tar.zst')
+        with open(str(zst_path), 'wb') as zst_handle:
+            zst_handle.write(
+                zstandard.ZstdCompressor().compress(tar_bytes.getvalue()))
+        names = [name for name, lines in iter_archive_members(zst_path)]
+        self.assertEqual(len(names), len(self.dump_names))
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
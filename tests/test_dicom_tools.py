@@ -1,8 +1,10 @@
 import unittest
 import os
 import re
+import tracemalloc
 import pathlib
 from pyapp.pylibs.dicom_tools import *
+from pyapp.pylibs.dicom_tools import HEADERS
 
 BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
 PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
@@ -15,6 +17,10 @@ class TestDicomTools(unittest.TestCase):
                                         'dcmtk_dump_src.txt')
         self.valid_fuji = pathlib.Path(PARENT_PATH, 'input', 'tag_dumps',
                                        'fuji_dicom_dump.txt')
+        self.valid_xml = pathlib.Path(PARENT_PATH, 'output',
+                                      'dicom_export_example',
+                                      '9fe63f0a-d304-4a22-9e4b-f0ebe63f7f78'
+                                      '.xml')
 
     def test_build_dcmtk_tag_dict(self):
         dcmtk_tag_dict = build_dcmtk_tag_dict(self.valid_dcmtk)
@@ -36,6 +42,169 @@ class TestDicomTools(unittest.TestCase):
                 self.assertIsInstance(tag, str)
                 self.assertEqual(tag[match.start():match.end()], tag)
 
+    def test_build_xml_tag_dict(self):
+        xml_tag_dict = build_xml_tag_dict(self.valid_xml)
+        self.assertEqual(list(xml_tag_dict.keys()), HEADERS)
+        # match: 0008,0050
+        for key, tag in xml_tag_dict.items():
+            if 'filename' not in key:
+                match = re.search("^[0-9]{4},[0-9]{4}$", tag)
+                self.assertIsNotNone(match)
+
+    def test_parse_xml_tag_dump(self):
+        xml_tag_dict = build_xml_tag_dict(self.valid_xml)
+        with open(str(self.valid_xml), 'rb') as xml_handle:
+            tag_values = parse_xml_tag_dump(xml_handle, xml_tag_dict)
+        self.assertEqual(list(tag_values.keys()), HEADERS)
+        self.assertEqual(tag_values['accessionNumber'], '20022002')
+        self.assertEqual(tag_values['modality'], 'OT')
+        self.assertEqual(tag_values['sourceApplicationEntityTitle'], 'DCF')
+        self.assertEqual(tag_values['transferSyntaxUid'],
+                         '1.2.840.10008.1.2')
+        self.assertEqual(tag_values['studyDate'], '20021117')
+        self.assertEqual(tag_values['stationName'], '')
+
+    def test_parse_xml_tag_dump_streaming(self):
+        xml_tag_dict = build_xml_tag_dict(self.valid_xml)
+        chunks_read = []
+
+        def xml_chunks():
+            yield ('<?xml version="1.0" encoding="UTF-8"?>\n<file-format>'
+                   '<meta-header><element tag="0002,0016">SRC_AET</element>'
+                   '</meta-header><data-set>'
+                   '<sequence tag="0040,0275"><item>'
+                   '<element tag="0008,0050">NESTED</element>'
+                   '</item></sequence>'
+                   '<element tag="7fe0,0010" binary="yes">')
+            for _ in range(1000):
+                chunks_read.append(1)
+                yield 'QUFBQUFB' * 1024  # base64 pixel data
+            yield '</element>'
+            for tag, value in (('0008,0050', 'ACC1'), ('0008,0060', 'CT'),
+                               ('0008,1010', 'ST1'), ('0008,0080', 'INST'),
+                               ('0008,0070', 'MFR'), ('0008,1090', 'MDL'),
+                               ('0002,0010', '1.2.840.10008.1.2'),
+                               ('0008,0020', '20200601')):
+                yield f'<element tag="{tag}">{value}</element>'
+            yield '<element tag="0010,0010">after all tags found</element>'
+            chunks_read.append('unread')
+            yield '</data-set></file-format>'
+
+        tag_values = parse_xml_tag_dump(xml_chunks(), xml_tag_dict)
+        self.assertEqual(tag_values['accessionNumber'], 'ACC1')
+        self.assertEqual(tag_values['sourceApplicationEntityTitle'],
+                         'SRC_AET')
+        self.assertEqual(tag_values['studyDate'], '20200601')
+        self.assertNotIn('unread', chunks_read)
+
+    def test_parse_xml_tag_dump_memory(self):
+        xml_tag_dict = build_xml_tag_dict(self.valid_xml)
+        pixel_chunk = 'QUFBQUFB' * 8192  # 64 KB of base64 pixel data
+
+        def xml_chunks():
+            yield ('<?xml version="1.0" encoding="UTF-8"?>\n<file-format>'
+                   '<data-set><element tag="0008,0050">ACC1</element>'
+                   '<element tag="7fe0,0010" binary="yes">')
+            for _ in range(320):  # 20 MB element
+                yield pixel_chunk
+            # StationName never found: whole dump is parsed
+            yield '</element></data-set></file-format>'
+
+        tracemalloc.start()
+        try:
+            tag_values = parse_xml_tag_dump(xml_chunks(), xml_tag_dict)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(tag_values['accessionNumber'], 'ACC1')
+        self.assertEqual(tag_values['stationName'], '')
+        # text of unrequested elements is never buffered
+        self.assertLess(peak_bytes, 2 * 1024 * 1024)
+
+    def test_parse_xml_tag_dump_date_window(self):
+        xml_tag_dict = build_xml_tag_dict(self.valid_xml)
+        for date_window, is_in_window in ((('20021101', '20021130'), True),
+                                          (('20200101', '99999999'), False),
+                                          (('00000000', '20011231'), False),
+                                          ('', True)):
+            with open(str(self.valid_xml), 'rb') as xml_handle:
+                tag_values = parse_xml_tag_dump(xml_handle, xml_tag_dict,
+                                                date_window)
+            self.assertEqual(tag_values is not None, is_in_window)
+
+    def test_normalize_transfer_syntax(self):
+        # DCMTK names and UIDs of other sources count as one value
+        self.assertEqual(normalize_transfer_syntax(
+            'JPEGLossless:Non-hierarchical-1stOrderPrediction'),
+            '1.2.840.10008.1.2.4.70')
+        self.assertEqual(normalize_transfer_syntax('LittleEndianImplicit'),
+                         '1.2.840.10008.1.2')
+        self.assertEqual(normalize_transfer_syntax('JPEG2000LosslessOnly'),
+                         '1.2.840.10008.1.2.4.90')
+        self.assertEqual(normalize_transfer_syntax('JPEG2000Lossless'),
+                         '1.2.840.10008.1.2.4.90')
+        self.assertEqual(normalize_transfer_syntax('1.2.840.10008.1.2\x00'),
+                         '1.2.840.10008.1.2')
+        self.assertEqual(normalize_transfer_syntax('1.2.3.private'),
+                         '1.2.3.private')
+        self.assertEqual(normalize_transfer_syntax(None), '')
+
+    def test_get_dump_sop_uid(self):
+        dump_dir = pathlib.Path(PARENT_PATH, 'input', 'tag_dumps')
+        for dump_path, dump_format, sop_uid in (
+                (pathlib.Path(dump_dir, 'dcmtk_dump_src.txt'), 'dcmtk',
+                 '1.3.12.2.1107.5.1.4.54751.30000018050408375996800002174'),
+                (self.valid_xml, 'xml', '2.16.124.113543.6004.101.103.'
+                                        '20021117.190619.1.001.001')):
+            head_str = dump_path.read_text()[:64 * 1024]
+            self.assertEqual(get_dump_sop_uid(head_str, dump_format),
+                             sop_uid)
+        self.assertTrue(get_dump_sop_uid(self.valid_fuji.read_text(),
+                                         'fuji').startswith('1.3.12.2.'))
+        # MediaStorageSOPInstanceUID when (0008,0018) is past the head
+        self.assertEqual(get_dump_sop_uid(
+            '(0002,0003) UI [1.2.3.4] #   8, 1 MediaStorageSOPInstanceUID',
+            'dcmtk'), '1.2.3.4')
+        self.assertEqual(get_dump_sop_uid('no uid here', 'dcmtk'), '')
+
+    def test_is_date_in_window(self):
+        date_window = ('20200601', '20200630')
+        self.assertTrue(is_date_in_window('20200601', date_window))
+        self.assertTrue(is_date_in_window('2020-06-30', date_window))
+        self.assertFalse(is_date_in_window('20200531', date_window))
+        self.assertFalse(is_date_in_window('20200701', date_window))
+        # unknown dates are kept, never silently dropped
+        self.assertTrue(is_date_in_window('', date_window))
+        self.assertTrue(is_date_in_window('2020', date_window))
+        self.assertTrue(is_date_in_window('20000101', ''))
+
+    def test_extract_dataset_tags(self):
+        try:
+            import pydicom
+        except ImportError:
+            self.skipTest("'pydicom' not installed")
+        dcm_path = next(self.valid_dir.rglob('*.dcm'))
+        dataset = pydicom.dcmread(str(dcm_path), stop_before_pixels=True)
+        keyword_tag_dict = build_keyword_tag_dict(dcm_path)
+        self.assertEqual(list(keyword_tag_dict.keys()), HEADERS)
+        tag_values = extract_dataset_tags(dataset, keyword_tag_dict)
+        self.assertEqual(tag_values['filename'], dcm_path.name)
+        self.assertEqual(tag_values['accessionNumber'], '20022002')
+        self.assertEqual(tag_values['sourceApplicationEntityTitle'], 'DCF')
+        self.assertEqual(tag_values['transferSyntaxUid'],
+                         '1.2.840.10008.1.2')
+        self.assertEqual(tag_values['stationName'], '')
+
+    def test_sniff_dump_format(self):
+        for dump_path, dump_format in ((self.valid_dcmtk, 'dcmtk'),
+                                       (self.valid_fuji, 'fuji'),
+                                       (self.valid_xml, 'xml')):
+            with open(str(dump_path), 'r', errors='replace') as dump_file:
+                sample_str = dump_file.read(4096)
+            self.assertEqual(sniff_dump_format(sample_str), dump_format)
+        self.assertEqual(sniff_dump_format('date,time,message\n'), '')
+        self.assertEqual(sniff_dump_format(''), '')
+
     def tearDown(self) -> None:
         pass
 
@@ -0,0 +1,148 @@
+import unittest
+import csv
+import os
+import pathlib
+import shutil
+import tracemalloc
+import xlsxwriter
+
+from pyapp.pylibs.diff_tools import *
+from pyapp.pylibs import dicom_tools
+from pyapp.pylibs import transfer_store
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+
+def make_row(filename: str, accession: str, aet: str, station: str = 'SN',
+             modality: str = 'CT') -> list:
+    return [filename, accession, modality, aet, station, 'Local Hospital',
+            'GE', 'SIGNA', '1.2.840.10008.1.2', '20190308']
+
+
+class TestDiffTools(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/diff_tools.py"""
+
+    def setUp(self):
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+        self.old_rows = [make_row('a.txt', '1', 'PH_CT'),
+                         make_row('b.txt', '2', 'PH_CT'),
+                         make_row('c.txt', '3', 'VANC_MR'),
+                         make_row('d.txt', '3', 'VANC_MR')]
+        self.new_rows = [make_row('a2.txt', '1', 'PH_CT'),
+                         make_row('c.txt', '3', 'VANC_MR', modality='MR'),
+                         make_row('d.txt', '3', 'VANC_MR'),
+                         make_row('e.txt', '4', 'VANC_MR', 'ST2')]
+        self.old_path = pathlib.Path(self.out_path, 'old.csv')
+        self.new_path = pathlib.Path(self.out_path, 'new.csv')
+        for csv_path, rows in ((self.old_path, self.old_rows),
+                               (self.new_path, self.new_rows)):
+            with open(str(csv_path), 'w', newline='') as csv_file:
+                csv.writer(csv_file).writerows([dicom_tools.HEADERS] + rows)
+
+    def test_iter_result_rows(self):
+        self.assertEqual(list(iter_result_rows(self.old_path)),
+                         self.old_rows)
+        xlsx_path = pathlib.Path(self.out_path, 'old.xlsx')
+        workbook = xlsxwriter.Workbook(str(xlsx_path))
+        worksheet = workbook.add_worksheet()
+        # report style: capitalized headers, reordered columns
+        headers = [hdr[0].upper() + hdr[1:] for hdr in dicom_tools.HEADERS]
+        worksheet.write_row(0, 0, headers[::-1])
+        for row_num, row in enumerate(self.old_rows, 1):
+            worksheet.write_row(row_num, 0, row[::-1])
+        workbook.close()
+        self.assertEqual(list(iter_result_rows(xlsx_path)), self.old_rows)
+        store_path = pathlib.Path(self.out_path, 'old.db')
+        conn = transfer_store.open_store(store_path)
+        transfer_store.load_rows(conn, [dicom_tools.HEADERS] + self.old_rows)
+        conn.close()
+        self.assertEqual(sorted(iter_result_rows(store_path)),
+                         sorted(self.old_rows))
+        bad_path = pathlib.Path(self.out_path, 'bad.csv')
+        bad_path.write_text('filename,modality\na.txt,CT\n')
+        self.assertRaises(ValueError, list, iter_result_rows(bad_path))
+
+    def test_iter_xlsx_rows_memory(self):
+        xlsx_path = pathlib.Path(self.out_path, 'large.xlsx')
+        workbook = xlsxwriter.Workbook(str(xlsx_path))
+        worksheet = workbook.add_worksheet()
+        for row_num in range(30000):
+            worksheet.write_row(row_num, 0, ['PH_CT', 'CT', row_num])
+        workbook.close()
+        tracemalloc.start()
+        try:
+            row_count = sum(1 for _ in iter_xlsx_rows(xlsx_path))
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(row_count, 30000)
+        # parsed rows are dropped from the tree, not kept as empty elements
+        self.assertLess(peak_bytes, 1.5 * 1024 * 1024)
+
+    def test_ps_report(self):
+        report_path = pathlib.Path(PARENT_PATH, 'output',
+                                   'IMG_RTR_Transfers_06-09-19.xlsx')
+        rows = list(iter_result_rows(report_path))
+        self.assertEqual(len(rows), 6)
+        # Excel serial day number to yyyyMMdd
+        self.assertEqual(rows[0][dicom_tools.HEADERS.index('studyDate')],
+                         '20190308')
+
+    def test_external_sort(self):
+        rows = [[str(num % 7), str(num)] for num in range(50)]
+        temp_dir = str(self.out_path)
+        self.assertEqual(list(external_sort(rows, 4, temp_dir)), sorted(rows))
+        self.assertEqual(list(external_sort(rows, 100)), sorted(rows))
+        self.assertEqual(list(external_sort([], 4)), [])
+        # sorted runs removed after the merge
+        self.assertEqual(sorted(os.listdir(temp_dir)),
+                         ['new.csv', 'old.csv'])
+
+    def test_iter_row_deltas(self):
+        deltas = list(iter_row_deltas(self.old_rows, self.new_rows, 2,
+                                      str(self.out_path)))
+        statuses = [(status, row[0]) for status, row, _ in deltas]
+        # renamed dump 'a2.txt' and unchanged 'd.txt' are not deltas
+        self.assertEqual(statuses, [('missing', 'b.txt'),
+                                    ('changed', 'c.txt'),
+                                    ('new', 'e.txt')])
+        self.assertEqual(deltas[1][2], "modality: 'CT' -> 'MR'")
+
+    def test_transfer_syntax_forms(self):
+        name_row = make_row('a.txt', '1', 'PH_CT')
+        name_row[dicom_tools.HEADERS.index('transferSyntaxUid')] = \
+            'LittleEndianImplicit'
+        name_path = pathlib.Path(self.out_path, 'name.csv')
+        with open(str(name_path), 'w', newline='') as csv_file:
+            csv.writer(csv_file).writerows([dicom_tools.HEADERS, name_row])
+        name_rows = list(iter_result_rows(name_path))
+        self.assertEqual(name_rows, [make_row('a.txt', '1', 'PH_CT')])
+        # DCMTK name vs UID of the same syntax is not a change
+        self.assertEqual(list(iter_row_deltas(
+            name_rows, [make_row('a.txt', '1', 'PH_CT')])), [])
+
+    def test_diff_results(self):
+        rows_path = pathlib.Path(self.out_path, 'diff_rows.csv')
+        status_counts, volume_list = diff_results(
+            self.old_path, self.new_path, rows_path, 2, str(self.out_path))
+        self.assertEqual(dict(status_counts),
+                         {'new': 1, 'missing': 1, 'changed': 1})
+        self.assertEqual(volume_list[0],
+                         ['column', 'value', 'old', 'new', 'delta'])
+        self.assertIn(['sourceApplicationEntityTitle', 'PH_CT', 2, 1, -1],
+                      volume_list)
+        self.assertIn(['stationName', 'ST2', 0, 1, 1], volume_list)
+        # equal volumes are not listed
+        self.assertNotIn('Local Hospital', [row[1] for row in volume_list])
+        with open(str(rows_path), newline='') as csv_file:
+            self.assertEqual(len(list(csv.reader(csv_file))), 4)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
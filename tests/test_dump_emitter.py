@@ -0,0 +1,85 @@
+import unittest
+import os
+import json
+import pathlib
+import shutil
+
+from pyapp.pylibs.dump_emitter import *
+from pyapp.pylibs import dicom_tools
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+
+class TestDumpEmitter(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/dump_emitter.py"""
+
+    def setUp(self):
+        try:
+            import pydicom
+        except ImportError:
+            self.skipTest("'pydicom' not installed")
+        example_dir = pathlib.Path(PARENT_PATH, 'output',
+                                   'dicom_export_example')
+        self.dcm_path = next(example_dir.glob('*.dcm'))
+        self.dcm2xml_path = self.dcm_path.with_suffix('.xml')
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+
+    def test_iter_study_dicoms(self):
+        src_path = pathlib.Path(self.out_path, 'src')
+        for rel_path, size in (('A/small.dcm', 10), ('A/s/large.dcm', 99),
+                               ('B/notes.txt', 99), ('SWMC_01/a.dcm', 1)):
+            file_path = pathlib.Path(src_path, rel_path)
+            os.makedirs(str(file_path.parent), exist_ok=True)
+            file_path.write_bytes(b'0' * size)
+        study_dicoms = [(study_path.name, dcm_path.name) for
+                        study_path, dcm_path in
+                        iter_study_dicoms(src_path, exclude_dirs=['SWMC_'])]
+        self.assertEqual(study_dicoms, [('A', 'large.dcm')])
+
+    def test_emit_dicom_dumps(self):
+        status_str = emit_dicom_dumps(self.dcm_path, self.out_path)
+        self.assertNotIn('ERROR', status_str)
+        xml_path = pathlib.Path(self.out_path, f"{self.dcm_path.stem}.xml")
+        json_path = xml_path.with_suffix('.json')
+        # same elements (tag, vr, vm, len) as dcm2xml output
+        dcm2xml_lines = [line.split(' name=')[0] for line in
+                         self.dcm2xml_path.read_text().splitlines()
+                         if line.startswith('<element')]
+        xml_lines = [line.split(' name=')[0] for line in
+                     xml_path.read_text().splitlines()
+                     if line.startswith('<element')]
+        self.assertEqual(xml_lines, dcm2xml_lines)
+        with open(str(xml_path), 'rb') as xml_handle:
+            tag_values = dicom_tools.parse_xml_tag_dump(
+                xml_handle, dicom_tools.build_xml_tag_dict(xml_path))
+        self.assertEqual(tag_values['accessionNumber'], '20022002')
+        self.assertEqual(tag_values['sourceApplicationEntityTitle'], 'DCF')
+        with open(str(json_path), 'r') as json_file:
+            json_dict = json.load(json_file)
+        self.assertEqual(json_dict['00080050'],
+                         {'vr': 'SH', 'Value': ['20022002']})
+        self.assertEqual(json_dict['00020016']['Value'], ['DCF'])
+        # pixel data never read, referenced by file offset
+        pixel_uri = json_dict['7FE00010']['BulkDataURI']
+        self.assertTrue(pixel_uri.endswith('&length=2097152'))
+        offset = int(pixel_uri.split('offset=')[1].split('&')[0])
+        with open(str(self.dcm_path), 'rb') as dcm_file:
+            dcm_file.seek(offset - 4)
+            self.assertEqual(int.from_bytes(dcm_file.read(4), 'little'),
+                             2097152)
+
+    def test_emit_dicom_dumps_invalid(self):
+        not_dcm = pathlib.Path(self.out_path, 'not.dcm')
+        not_dcm.write_bytes(b'')
+        self.assertTrue(emit_dicom_dumps(not_dcm, self.out_path,
+                                         ('xml',)).startswith('~!ERROR!~'))
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
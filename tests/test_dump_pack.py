@@ -0,0 +1,106 @@
+import unittest
+import os
+import pathlib
+import shutil
+
+from pyapp.pylibs.dump_pack import *
+from pyapp.pylibs.archive_tools import iter_archive_members
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+
+class TestDumpPack(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/dump_pack.py"""
+
+    def setUp(self):
+        self.dump_dir = pathlib.Path(PARENT_PATH, 'input', 'tag_dumps')
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+        self.pack_path = pathlib.Path(self.out_path, f"dumps{PACK_EXT}")
+        self.dump_dict = {f"study/{p.name}": p.read_bytes()
+                          for p in sorted(self.dump_dir.glob('*.txt'))}
+        with DumpPack(self.pack_path, 'a') as pack:
+            for num, (name, dump_bytes) in enumerate(self.dump_dict.items()):
+                pack.append(name, dump_bytes, uid=f"1.2.3.{num}",
+                            mtime=1000.0 * num)
+
+    def test_read(self):
+        with DumpPack(self.pack_path) as pack:
+            self.assertEqual(len(pack), len(self.dump_dict))
+            for num, (name, dump_bytes) in enumerate(self.dump_dict.items()):
+                self.assertEqual(pack.read(name), dump_bytes)
+                self.assertEqual(pack.read(f"1.2.3.{num}"), dump_bytes)
+            self.assertIn('1.2.3.0', pack)
+            self.assertRaises(KeyError, pack.read, 'study/missing.txt')
+
+    def test_iter_dumps(self):
+        with DumpPack(self.pack_path) as pack:
+            self.assertEqual(dict(pack.iter_dumps()), self.dump_dict)
+            self.assertEqual(list(pack.iter_dumps('.xml')), [])
+            names = [name for name, _ in pack.iter_dumps(min_mtime=1000.0)]
+            self.assertEqual(names, list(self.dump_dict)[1:])
+
+    def test_append_only(self):
+        with DumpPack(self.pack_path, 'a') as pack:
+            self.assertFalse(pack.append('study/fuji_dicom_dump.txt', b''))
+            self.assertTrue(pack.append('study/new.xml', b'<file-format/>'))
+            self.assertRaises(ValueError, pack.append, 'bad\tname', b'')
+        with DumpPack(self.pack_path) as pack:
+            self.assertEqual(pack.read('study/new.xml'), b'<file-format/>')
+
+    def test_recover(self):
+        # frame appended without index entry, then a torn partial frame
+        with DumpPack(self.pack_path, 'a') as pack:
+            pack.append('study/unindexed.txt', b'dump')
+        index_lines = pathlib.Path(f"{self.pack_path}{INDEX_EXT}")\
+            .read_text().splitlines(keepends=True)
+        pathlib.Path(f"{self.pack_path}{INDEX_EXT}").write_text(
+            ''.join(index_lines[:-1]) + 'study/torn')
+        pack_size = self.pack_path.stat().st_size
+        with open(str(self.pack_path), 'ab') as pack_file:
+            pack_file.write(b'DPKF\x05')
+        with DumpPack(self.pack_path) as pack:
+            self.assertEqual(pack.read('study/unindexed.txt'), b'dump')
+        with DumpPack(self.pack_path, 'a') as pack:
+            self.assertEqual(self.pack_path.stat().st_size, pack_size)
+            self.assertTrue(pack.append('study/after.txt', b'after'))
+        with DumpPack(self.pack_path) as pack:
+            self.assertEqual(len(pack), len(self.dump_dict) + 2)
+            self.assertEqual(pack.read('study/after.txt'), b'after')
+        not_pack = pathlib.Path(self.out_path, f"not{PACK_EXT}")
+        not_pack.write_bytes(b'PK\x03\x04')
+        self.assertRaises(ValueError, DumpPack, not_pack)
+
+    def test_stale_index(self):
+        # index entry past the end of the pack (pack truncated/replaced)
+        index_path = pathlib.Path(f"{self.pack_path}{INDEX_EXT}")
+        pack_size = self.pack_path.stat().st_size
+        with open(str(index_path), 'a') as idx:
+            idx.write(f"study/gone.txt\t1.2.9\t{pack_size}\t100\n")
+        with DumpPack(self.pack_path) as pack:
+            self.assertNotIn('study/gone.txt', pack)
+            self.assertEqual(len(pack), len(self.dump_dict))
+        with DumpPack(self.pack_path, 'a') as pack:
+            # pack never grown to a stale end offset, entry dropped
+            self.assertEqual(self.pack_path.stat().st_size, pack_size)
+            self.assertNotIn('study/gone.txt', index_path.read_text())
+            self.assertTrue(pack.append('study/gone.txt', b'back'))
+        with DumpPack(self.pack_path) as pack:
+            self.assertEqual(pack.read('study/gone.txt'), b'back')
+            self.assertEqual(pack.read('1.2.3.0'),
+                             list(self.dump_dict.values())[0])
+
+    def test_iter_archive_members(self):
+        members = {name: handle.read() for name, handle in
+                   iter_archive_members(self.pack_path, ('.txt', '.xml'),
+                                        is_binary=True)}
+        self.assertEqual(members, self.dump_dict)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
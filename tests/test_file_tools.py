@@ -1,6 +1,8 @@
 import unittest
+import io
 import os
 import pathlib
+import time
 from sys import platform
 import shutil
 
@@ -100,6 +102,64 @@ class TestFileTools(unittest.TestCase):
         self.assertTrue(
             os.path.exists(os.path.join(self.out_path, 'out_3.log')))
 
+    def test_save_output_csv(self):
+        csv_path = pathlib.Path(self.out_path, 'rows.csv')
+        tag_list = [['hdr_a', 'hdr_b'], ['a1', 'b,1'], ['a2', 'b2']]
+        self.assertEqual(save_output_csv(csv_path, tag_list), 2)
+        self.assertEqual(save_output_csv(csv_path, tag_list), 2)
+        with open(str(csv_path), 'r', encoding='utf-8') as csv_file:
+            lines = csv_file.read().splitlines()
+        self.assertEqual(len(lines), 5)  # header written once
+        self.assertEqual(lines[1], 'a1,"b,1"')
+        save_output_csv(csv_path, tag_list, append=False)
+        with open(str(csv_path), 'r', encoding='utf-8') as csv_file:
+            self.assertEqual(len(csv_file.read().splitlines()), 3)
+
+    def test_detect_bom_encoding(self):
+        self.assertEqual(detect_bom_encoding('dump'.encode('utf-16')),
+                         'utf-16')
+        self.assertEqual(detect_bom_encoding('dump'.encode('utf-8-sig')),
+                         'utf-8-sig')
+        self.assertEqual(detect_bom_encoding(b'dump', 'latin-1'), 'latin-1')
+
+    def test_read_file_sample(self):
+        binary_handle = io.BytesIO(b'0123456789')
+        self.assertEqual(read_file_sample(binary_handle, 4), b'0123')
+        self.assertEqual(binary_handle.read(), b'456789')
+
+    def test_iter_guarded_chunks(self):
+        binary_handle = io.BytesIO(b'x' * 1000)
+        chunks = list(iter_guarded_chunks(binary_handle, 300, 5.0,
+                                          chunk_size=128, head=b'h'))
+        self.assertEqual(chunks[0], b'h')
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 300)
+
+        class SlowStream(io.RawIOBase):
+            def readinto(self, buffer):
+                time.sleep(0.05)
+                buffer[0:1] = b'x'
+                return 1
+        with self.assertRaises(TimeoutError):
+            for _ in iter_guarded_chunks(SlowStream(), 10 ** 6, 0.2):
+                pass
+
+    def test_iter_guarded_lines(self):
+        text_str = 'line1\r\n' + 'y' * 100 + '\nline3\nlast'
+        binary_handle = io.BytesIO(text_str.encode('utf-16'))
+        lines = list(iter_guarded_lines(binary_handle, 'utf-16', 10,
+                                        10 ** 6, 5.0))
+        self.assertEqual(lines, ['line1\n', 'y' * 10 + '\n', 'line3\n',
+                                 'last'])
+        # single huge line never held in memory beyond cap
+        binary_handle = io.BytesIO(b'z' * 10 ** 6 + b'\nafter\n')
+        lines = list(iter_guarded_lines(binary_handle, 'utf-8', 16,
+                                        10 ** 7, 5.0))
+        self.assertEqual(lines, ['z' * 16 + '\n', 'after\n'])
+        binary_handle = io.BytesIO(b'a\n' * 1000)
+        lines = list(iter_guarded_lines(binary_handle, 'utf-8', 16,
+                                        100, 5.0))
+        self.assertEqual(len(lines), 50)
+
     def test_get_sha256_hash(self):
         sha_hex = get_sha256_hash(self.valid_file)
         self.assertIsInstance(sha_hex, str)
@@ -121,6 +181,68 @@ class TestFileTools(unittest.TestCase):
             self.assertIn('.dcm', str(_file))
             self.assertNotIn('.py', str(_file))
 
+    def build_tree(self) -> pathlib.Path:
+        tree_path = pathlib.Path(self.out_path, 'tree')
+        for rel_path in ['b/2.txt', 'b/1.txt', 'a.txt', 'a/c/3.txt',
+                         'a/c/4.dcm', '.git/5.txt', 'SWMC_01/6.txt',
+                         'PH_CT/7.txt']:
+            file_path = pathlib.Path(tree_path, rel_path)
+            os.makedirs(str(file_path.parent), exist_ok=True)
+            file_path.write_text(rel_path)
+        return tree_path
+
+    def test_is_config_in_path(self):
+        self.assertTrue(is_config_in_path(self.valid_dir))
+        self.assertFalse(is_config_in_path(
+            pathlib.Path(PARENT_PATH, '.git', 'config')))
+
+    def test_scan_entries(self):
+        tree_path = self.build_tree()
+        names = sorted(entry.name for entry in scan_entries(tree_path))
+        self.assertEqual(names, ['1.txt', '2.txt', '3.txt', '4.dcm',
+                                 '6.txt', '7.txt', 'a.txt'])
+        names = [entry.name for entry in
+                 scan_entries(tree_path, ('.dcm', '.txt'), recursive=False)]
+        self.assertEqual(names, ['a.txt'])
+        names = sorted(entry.name for entry in
+                       scan_entries(tree_path, want_dirs=True,
+                                    exclude_dirs=['SWMC_']))
+        self.assertEqual(names, ['PH_CT', 'a', 'b', 'c'])
+
+    def test_iter_files(self):
+        tree_path = self.build_tree()
+        file_iter = iter_files(tree_path, '.txt')
+        self.assertFalse(isinstance(file_iter, list))  # lazy generator
+        self.assertIsInstance(next(file_iter), pathlib.Path)
+        sorted_list = list(iter_files(tree_path, '.txt', sort=True,
+                                      exclude_dirs=['SWMC_']))
+        # same ordering as sorted(rglob()) without pruned directories
+        expected = [p.absolute() for p in sorted(tree_path.rglob('*.txt'))
+                    if '.git' not in p.parts and 'SWMC_01' not in p.parts]
+        self.assertEqual(sorted_list, expected)
+        self.assertEqual(list(iter_files(self.invalid_path, '.txt')), [])
+
+    def test_iter_files_min_mtime(self):
+        tree_path = self.build_tree()
+        old_time = time.time() - 10 * 24 * 60 * 60
+        for rel_path in ['b/1.txt', 'a/c/3.txt', 'a/c/4.dcm', 'a/c']:
+            file_path = pathlib.Path(tree_path, rel_path)
+            os.utime(str(file_path), (old_time, old_time))
+        min_mtime = time.time() - 24 * 60 * 60
+        names = [p.name for p in iter_files(tree_path, sort=True,
+                                            min_mtime=min_mtime)]
+        # old files skipped, old directory ('a/c') files not even stat'ed
+        self.assertEqual(names, ['7.txt', '6.txt', 'a.txt', '2.txt'])
+        self.assertEqual(len(list(iter_files(tree_path, min_mtime=0.0))), 7)
+
+    def test_iter_directories(self):
+        tree_path = self.build_tree()
+        dir_list = list(iter_directories(tree_path, sort=True))
+        self.assertEqual([p.name for p in dir_list],
+                         ['PH_CT', 'SWMC_01', 'a', 'c', 'b'])
+        dir_list = list(iter_directories(tree_path, recursive=False))
+        self.assertEqual(len(dir_list), 4)
+
     def test_get_directories(self):
         dir_list = get_directories(self.valid_dir)
         for folder in dir_list:
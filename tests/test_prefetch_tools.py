@@ -0,0 +1,99 @@
+import unittest
+import os
+import pathlib
+import shutil
+import threading
+import time
+
+from pyapp.pylibs.prefetch_tools import *
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+LATENCY_SECONDS = 0.05
+
+
+class TestPrefetchTools(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/prefetch_tools.py"""
+
+    def setUp(self):
+        self.dump_dir = pathlib.Path(PARENT_PATH, 'input', 'tag_dumps')
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+        self.file_paths = []
+        for file_num in range(20):
+            file_path = pathlib.Path(self.out_path, f"{file_num:02}.txt")
+            file_path.write_bytes(bytes([file_num]) * (100 + file_num))
+            self.file_paths.append(file_path)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def slow_read(self, file_path: pathlib.Path, head_bytes: int) -> tuple:
+        """Local directory simulating network share open latency."""
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(LATENCY_SECONDS)
+        with self.lock:
+            self.in_flight -= 1
+        return read_file_head(file_path, head_bytes)
+
+    def test_prefetched_file(self):
+        file_path = next(self.dump_dir.glob('*.txt'))
+        file_bytes = file_path.read_bytes()
+        head, is_complete = read_file_head(file_path, 100)
+        self.assertFalse(is_complete)
+        with PrefetchedFile(file_path, head, is_complete) as read_handle:
+            self.assertEqual(read_handle.read(60), file_bytes[:60])
+            # read across head/tail boundary, tail opened on demand
+            self.assertEqual(read_handle.read(80), file_bytes[60:140])
+            self.assertEqual(read_handle.tell(), 140)
+            self.assertEqual(read_handle.read(), file_bytes[140:])
+            self.assertEqual(read_handle.read(10), b'')
+        head, is_complete = read_file_head(file_path, len(file_bytes) + 1)
+        self.assertTrue(is_complete)
+        read_handle = PrefetchedFile(file_path, head, is_complete)
+        self.assertEqual(read_handle.read(), file_bytes)
+        self.assertIsNone(read_handle.tail_handle)
+        missing = PrefetchedFile(file_path, b'', True, FileNotFoundError())
+        self.assertRaises(FileNotFoundError, missing.read, 10)
+
+    def test_get_prefetch_depth(self):
+        self.assertEqual(get_prefetch_depth(0.0, 0.01), 1)
+        self.assertEqual(get_prefetch_depth(0.05, 0.01), 6)
+        self.assertEqual(get_prefetch_depth(5.0, 0.0, max_depth=32), 32)
+
+    def test_iter_prefetched(self):
+        missing_path = pathlib.Path(self.out_path, 'missing.txt')
+        input_paths = self.file_paths[:5] + [missing_path]
+        results = list(iter_prefetched(iter(input_paths), head_bytes=64))
+        # input order preserved, tails read past the prefetched head
+        self.assertEqual([file_path for file_path, _ in results[:5]],
+                         self.file_paths[:5])
+        for file_num, (_, read_handle) in enumerate(results[:5]):
+            self.assertEqual(read_handle.read(),
+                             bytes([file_num]) * (100 + file_num))
+        # read errors are raised to the parser, as open() would
+        self.assertEqual(results[-1][0], missing_path)
+        self.assertRaises(FileNotFoundError, results[-1][1].read)
+        serial = [read_handle.read() for _, read_handle in
+                  iter_prefetched(self.file_paths[:5], depth=0)]
+        self.assertEqual(serial[4], bytes([4]) * 104)
+
+    def test_iter_prefetched_latency(self):
+        start_time = time.perf_counter()
+        for _, read_handle in iter_prefetched(self.file_paths, depth=2,
+                                              read_func=self.slow_read):
+            read_handle.read()
+        elapsed = time.perf_counter() - start_time
+        # serial: 20 x latency, read-ahead depth adapts to hide latency
+        self.assertGreater(self.max_in_flight, 2)
+        self.assertLess(elapsed, len(self.file_paths) * LATENCY_SECONDS / 2)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from collections import Counter
+
+from pyapp.pylibs.sample_tools import *
+
+HEADERS = ['filename', 'modality', 'sourceApplicationEntityTitle',
+           'transferSyntaxUid']
+
+
+class TestSampleTools(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/sample_tools.py"""
+
+    def setUp(self):
+        # 3 folders of 100/200/300 dumps
+        self.items = [(f"F{folder}", (folder, num)) for folder in range(1, 4)
+                      for num in range(folder * 100)]
+
+    def test_get_stratum(self):
+        self.assertEqual(get_stratum(('PH_CT', 'study', 'dump.txt')), 'PH_CT')
+        self.assertEqual(get_stratum(('dump.txt',)), '')
+
+    def test_sample_items(self):
+        strata = sample_items(self.items, 50, 'reservoir', seed=7)
+        self.assertEqual(list(strata), [''])
+        population, sample = strata['']
+        self.assertEqual(population, len(self.items))
+        self.assertEqual(len(sample), 50)
+        self.assertEqual(len(set(sample)), 50)
+        # repeatable with a seed
+        self.assertEqual(sample_items(self.items, 50, seed=7), strata)
+        strata = sample_items(self.items, 150, 'folder', seed=7)
+        self.assertEqual({key: (count, len(sample)) for key, (count, sample)
+                          in strata.items()},
+                         {'F1': (100, 100), 'F2': (200, 150),
+                          'F3': (300, 150)})
+
+    def test_sample_uniform(self):
+        # each item kept with p = size / population
+        kept = Counter()
+        for seed in range(400):
+            kept.update(sample_items(((0, num) for num in range(10)), 3,
+                                     seed=seed)[''][1])
+        self.assertTrue(all(80 < count < 160 for count in kept.values()))
+
+    def test_estimate_counts(self):
+        def make_row(num):
+            return [f"{num}.txt", 'MR' if num % 4 == 0 else 'CT', 'PH_CT',
+                    '1.2.840.10008.1.2.4.90']
+        # census: exact counts, no error
+        strata_rows = {'': (8, [make_row(num) for num in range(8)])}
+        estimate_list = estimate_counts(strata_rows, HEADERS)
+        self.assertEqual(estimate_list[0], ['column', 'value', 'sampled',
+                                            'estimate', 'low', 'high'])
+        self.assertEqual(estimate_list[1], ['dumps', 'parsed', 8, 8, 8, 8])
+        self.assertIn(['modality', 'MR', 2, 2, 2, 2], estimate_list)
+        strata = sample_items(self.items, 40, 'folder', seed=3)
+        # non-dumps ([]) are sampled but only count in the population
+        strata_rows = {stratum: (count, [make_row(num) if num % 10 else []
+                                         for _, num in sample])
+                       for stratum, (count, sample) in strata.items()}
+        estimate_dict = {(row[0], row[1]): row[2:] for row in
+                         estimate_counts(strata_rows, HEADERS)[1:]}
+        sampled, estimate, low, high = estimate_dict[('modality', 'MR')]
+        true_count = sum(1 for _, (_, num) in self.items
+                         if num % 4 == 0 and num % 10)
+        self.assertTrue(low <= true_count <= high)
+        self.assertTrue(sampled <= low < estimate < high <= len(self.items))
+
+    def tearDown(self) -> None:
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import heapq
+import pathlib
+import shutil
+import time
+
+from pyapp.pylibs.scan_budget import *
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+
+class TestScanBudget(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/scan_budget.py"""
+
+    def setUp(self):
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        self.scan_path = pathlib.Path(self.out_path, 'scan')
+        now_time = time.time()
+        for age_days, study in enumerate(['PH_NEW', 'VANC_MID', 'PH_OLD']):
+            study_path = pathlib.Path(self.scan_path, study)
+            os.makedirs(str(study_path), exist_ok=True)
+            pathlib.Path(study_path, 'dump.txt').write_text('dump')
+            study_time = now_time - age_days * 24 * 60 * 60
+            os.utime(str(study_path), (study_time, study_time))
+        pathlib.Path(self.scan_path, 'loose.txt').write_text('dump')
+
+    def test_get_aet_rank(self):
+        self.assertEqual(get_aet_rank('VANC_MID', ['SWMC_', 'VANC_']), 1)
+        self.assertEqual(get_aet_rank('PH_NEW', ['SWMC_', 'VANC_']), 2)
+        self.assertEqual(get_aet_rank('PH_NEW'), 0)
+
+    def test_build_scan_heap(self):
+        scan_items = list(iter_scan_items([self.scan_path], []))
+        self.assertIn((self.scan_path, False), scan_items)
+        self.assertEqual(len(scan_items), 4)
+        scan_heap, skip_count = build_scan_heap(scan_items, ['VANC_'],
+                                                {str(self.scan_path)})
+        self.assertEqual(skip_count, 1)
+        order = [heapq.heappop(scan_heap)[3].name for _ in range(3)]
+        # chosen AETs first, then newest study folders first
+        self.assertEqual(order, ['VANC_MID', 'PH_NEW', 'PH_OLD'])
+
+    def test_scan_state(self):
+        state_path = pathlib.Path(self.out_path, 'state.txt')
+        rows_path = pathlib.Path(self.out_path, 'rows.csv')
+        rows_path.write_text('hdr\nrow1\n')
+        self.assertEqual(load_scan_state(state_path, [self.scan_path]), set())
+        reset_scan_state(state_path, rows_path, [self.scan_path])
+        self.assertFalse(rows_path.exists())
+        save_scan_state(state_path, 'item_1')
+        save_scan_state(state_path, 'item_2')
+        self.assertEqual(load_scan_state(state_path, [self.scan_path]),
+                         {'item_1', 'item_2'})
+        # state of another scan is ignored
+        self.assertEqual(load_scan_state(state_path, [self.out_path]), set())
+        rows_path.write_text('hdr\nrow1\nrow2\n')
+        self.assertEqual(load_scan_rows(rows_path), [['row1'], ['row2']])
+
+    def test_iter_budget_items(self):
+        scan_items = list(iter_scan_items([self.scan_path], []))
+        # budget already spent by a slow discovery: still one item per run
+        start_time = time.perf_counter()
+        scan_heap, _ = build_scan_heap(scan_items)
+        time.sleep(0.01)
+        popped = list(iter_budget_items(scan_heap, 0.0001, start_time))
+        self.assertEqual(len(popped), 1)
+        self.assertEqual(len(scan_heap), 3)
+        # reruns over the remainder keep making progress
+        while scan_heap:
+            self.assertEqual(len(list(iter_budget_items(scan_heap, 0.0001,
+                                                        start_time))), 1)
+        scan_heap, _ = build_scan_heap(scan_items)
+        self.assertEqual(len(list(iter_budget_items(scan_heap, 60.0))), 4)
+
+    def test_build_coverage_list(self):
+        coverage_list = build_coverage_list([2, 5], [1, 3], [4, ''])
+        self.assertEqual(coverage_list[0], ['status', 'items', 'dumps'])
+        self.assertEqual(coverage_list[3], ['remaining', 4, ''])
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
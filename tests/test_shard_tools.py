@@ -0,0 +1,112 @@
+import unittest
+import os
+import pathlib
+import shutil
+from collections import Counter
+
+from pyapp.pylibs.shard_tools import *
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+HEADERS = ['filename', 'modality']
+
+
+class TestShardTools(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/shard_tools.py"""
+
+    def setUp(self):
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        self.repo_path = pathlib.Path(self.out_path, 'repo')
+        for study in ['B_study', 'a_study']:
+            study_path = pathlib.Path(self.repo_path, study)
+            os.makedirs(str(study_path), exist_ok=True)
+            pathlib.Path(study_path, 'dump.txt').write_text('dump')
+        pathlib.Path(self.repo_path, 'loose.txt').write_text('dump')
+        self.archive_path = pathlib.Path(self.repo_path, 'a_study', 'x.zip')
+        self.archive_path.write_bytes(b'')
+
+    def test_parse_shard_arg(self):
+        self.assertEqual(parse_shard_arg('2/4'), (2, 4))
+        for shard_str in ['0/4', '5/4', '2', 'a/b']:
+            self.assertRaises(ValueError, parse_shard_arg, shard_str)
+
+    def test_get_shard(self):
+        # same shard on every host/process (not salted like hash())
+        self.assertEqual(get_shard('repo/PH_CT', 4), 3)
+        self.assertEqual(get_shard('repo/PH_CT', 7), 4)
+        shard_counts = Counter(get_shard(f"repo/study_{num}", 4)
+                               for num in range(400))
+        self.assertEqual(sorted(shard_counts), [1, 2, 3, 4])
+        self.assertTrue(all(count > 60 for count in shard_counts.values()))
+
+    def test_iter_shard_items(self):
+        items = list(iter_shard_items([self.repo_path], [self.archive_path]))
+        # walk order does not matter: merge sorts rows by order keys
+        self.assertCountEqual([(shard_key, order) for shard_key, order, _, _
+                               in items],
+                              [('repo/', [0, 0, '']),
+                               ('repo/B_study', [0, 0, 'B_study']),
+                               ('repo/a_study', [0, 0, 'a_study']),
+                               ('repo/a_study/x.zip', [1, 0, ''])])
+
+    def merge_round_trip(self, shard_count: int) -> list:
+        # rows as a single sorted walk finds them, dealt to shards unordered
+        walk_rows = [([0, 0, 'B_study', 0], ['b1.txt', 'CT']),
+                     ([0, 0, 'B_study', 1], ['b2.txt', 'MR']),
+                     ([0, 0, 'a.txt', 0], ['a.txt', 'CT']),
+                     ([0, 0, 'c_study', 0], ['c1.txt', 'OT']),
+                     ([1, 0, '', 0], ['z.txt', 'CR'])]
+        manifest_paths = []
+        for shard_num in range(1, shard_count + 1):
+            partial_path, manifest_path = get_shard_paths(
+                self.out_path, shard_num, shard_count)
+            order_rows = walk_rows[shard_num - 1::shard_count][::-1]
+            write_shard(partial_path, manifest_path, HEADERS, order_rows,
+                        [[[0, 0, 'bad.txt', 0], '/repo/bad.txt', 'junk']],
+                        {'shard': shard_num, 'shards': shard_count,
+                         'inputs': ['repo'], 'date_window': '',
+                         'exclude_aets': None, 'items': 1})
+            manifest_paths.append(manifest_path)
+        return manifest_paths
+
+    def test_merge_shards(self):
+        manifest_paths = self.merge_round_trip(3)
+        self.assertEqual(find_manifests([self.out_path]), manifest_paths)
+        tag_list, quarantine_list, manifests = merge_shards(
+            manifest_paths[::-1])
+        self.assertEqual(tag_list, [HEADERS, ['b1.txt', 'CT'],
+                                    ['b2.txt', 'MR'], ['a.txt', 'CT'],
+                                    ['c1.txt', 'OT'], ['z.txt', 'CR']])
+        self.assertEqual(len(quarantine_list), 4)
+        self.assertEqual([manifest['shard'] for manifest in manifests],
+                         [1, 2, 3])
+
+    def test_merge_errors(self):
+        manifest_paths = self.merge_round_trip(3)
+        self.assertRaises(ValueError, merge_shards, manifest_paths[:2])
+        self.assertRaises(ValueError, merge_shards, [])
+        with self.assertRaisesRegex(ValueError, 'duplicate shard 1 of 3'):
+            merge_shards(manifest_paths + manifest_paths[:1])
+        # partial of another run with the same shard number
+        other_path = pathlib.Path(self.out_path, 'other')
+        os.makedirs(str(other_path))
+        partial_path, manifest_path = get_shard_paths(other_path, 3, 3)
+        write_shard(partial_path, manifest_path, HEADERS, [], [],
+                    {'shard': 3, 'shards': 3, 'inputs': ['other'],
+                     'date_window': '', 'exclude_aets': None, 'items': 0})
+        self.assertRaises(ValueError, merge_shards,
+                          manifest_paths[:2] + [manifest_path])
+        # partial edited after its manifest was written
+        with open(str(manifest_paths[0].with_suffix('.csv')), 'a') as \
+                csv_file:
+            csv_file.write('x.txt,CT,"[0, 0, \\"x.txt\\", 0]"\n')
+        self.assertRaises(ValueError, merge_shards, manifest_paths)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import os
+import csv
+import pathlib
+import shutil
+
+from pyapp.pylibs.dicom_tools import HEADERS
+from pyapp.pylibs.store_scp import *
+from pyapp.pylibs import store_scp, transfer_store
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+try:
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.encaps import encapsulate
+    from pydicom.uid import ExplicitVRLittleEndian, JPEG2000Lossless
+    from pydicom.uid import generate_uid
+    from pynetdicom import AE
+    from pynetdicom.sop_class import CTImageStorage
+    # store_scp imports need pynetdicom >= 2, AE is None when they failed
+    HAS_PYNETDICOM = store_scp.AE is not None
+except ImportError:
+    HAS_PYNETDICOM = False
+
+
+def build_dataset(study_uid: str, accession: str, modality: str = 'CT',
+                  transfer_syntax: str = None) -> 'Dataset':
+    dataset = Dataset()
+    dataset.SOPClassUID = CTImageStorage
+    dataset.SOPInstanceUID = generate_uid()
+    dataset.StudyInstanceUID = study_uid
+    dataset.AccessionNumber = accession
+    dataset.Modality = modality
+    dataset.StationName = 'CT_549121'
+    dataset.InstitutionName = 'Local Hospital'
+    dataset.StudyDate = '20200601'
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    if transfer_syntax is None:
+        dataset.add_new(0x7FE00010, 'OB', b'\x00' * 1024)  # PixelData
+    else:  # compressed: encapsulated frame
+        dataset.add_new(0x7FE00010, 'OB', encapsulate([b'\x00' * 1024]))
+        dataset['PixelData'].is_undefined_length = True
+        dataset.file_meta.TransferSyntaxUID = transfer_syntax
+    return dataset
+
+
+@unittest.skipUnless(HAS_PYNETDICOM, "'pynetdicom' not installed")
+class TestStoreScp(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/store_scp.py"""
+
+    def setUp(self):
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+        self.csv_path = pathlib.Path(self.out_path, 'transfers.csv')
+        self.db_path = pathlib.Path(self.out_path, 'transfers.sqlite')
+
+    def test_parse_forward_addr(self):
+        self.assertEqual(parse_forward_addr('PACS@10.0.0.1:104'),
+                         ('PACS', '10.0.0.1', 104))
+
+    def test_build_dataset_row(self):
+        dataset = build_dataset('1.2.3', 'ACC1')
+        row = build_dataset_row(dataset, dataset.SOPInstanceUID)
+        self.assertEqual(len(row), len(HEADERS))
+        self.assertEqual(row[HEADERS.index('accessionNumber')], 'ACC1')
+        self.assertEqual(row[HEADERS.index('transferSyntaxUid')],
+                         ExplicitVRLittleEndian)
+
+    def test_store_scp(self):
+        server, row_queue, writer = start_store_scp(
+            'TEST_SCP', 0, 'localhost', self.csv_path, self.db_path)
+        port = server.server_address[1]
+        try:
+            scu_ae = AE(ae_title='TEST_SCU')
+            scu_ae.add_requested_context(CTImageStorage,
+                                         ExplicitVRLittleEndian)
+            study_a, study_b = generate_uid(), generate_uid()
+            datasets = [build_dataset(study_a, 'ACC_A'),
+                        build_dataset(study_a, 'ACC_A'),
+                        build_dataset(study_b, 'ACC_B', 'PR'),
+                        build_dataset(study_b, 'ACC_B')]
+            assoc = scu_ae.associate('localhost', port, ae_title='TEST_SCP')
+            self.assertTrue(assoc.is_established)
+            for dataset in datasets:
+                self.assertEqual(assoc.send_c_store(dataset).Status, 0x0000)
+            assoc.release()
+        finally:
+            stop_store_scp(server, row_queue, writer)
+        # no DICOMs written: only the report sinks
+        self.assertEqual(sorted(p.name for p in self.out_path.iterdir()),
+                         ['transfers.csv', 'transfers.sqlite'])
+        with open(str(self.csv_path), 'r', encoding='utf-8') as csv_file:
+            csv_rows = list(csv.reader(csv_file))
+        self.assertEqual(csv_rows[0], HEADERS)
+        self.assertEqual(len(csv_rows), 3)  # one row per study
+        self.assertEqual(csv_rows[1][HEADERS.index(
+            'sourceApplicationEntityTitle')], 'TEST_SCU')
+        self.assertEqual(csv_rows[2][HEADERS.index('modality')], 'CT')
+        conn = transfer_store.open_store(self.db_path)
+        self.assertEqual(transfer_store.count_rows(conn), 2)
+        conn.close()
+
+    def test_forward_compressed(self):
+        # downstream SCP: one row per study and association
+        down_csv = pathlib.Path(self.out_path, 'forwarded.csv')
+        down_server, down_queue, down_writer = start_store_scp(
+            'DOWN_SCP', 0, 'localhost', down_csv)
+        server, row_queue, writer = start_store_scp(
+            'TEST_SCP', 0, 'localhost', self.csv_path,
+            forward_addr=('DOWN_SCP', 'localhost',
+                          down_server.server_address[1]))
+        try:
+            scu_ae = AE(ae_title='TEST_SCU')
+            # compressed only: accepted without an uncompressed fallback
+            scu_ae.add_requested_context(CTImageStorage, JPEG2000Lossless)
+            assoc = scu_ae.associate('localhost', server.server_address[1],
+                                     ae_title='TEST_SCP')
+            self.assertTrue(assoc.is_established)
+            study_uid = generate_uid()
+            for _ in range(3):
+                dataset = build_dataset(study_uid, 'ACC_J2K',
+                                        transfer_syntax=JPEG2000Lossless)
+                self.assertEqual(assoc.send_c_store(dataset).Status, 0x0000)
+            assoc.release()
+        finally:
+            stop_store_scp(server, row_queue, writer)
+            stop_store_scp(down_server, down_queue, down_writer)
+        with open(str(down_csv), 'r', encoding='utf-8') as csv_file:
+            csv_rows = list(csv.reader(csv_file))
+        # one forwarding association for all instances of the study
+        self.assertEqual(len(csv_rows), 2)
+        self.assertEqual(csv_rows[1][HEADERS.index(
+            'sourceApplicationEntityTitle')], 'IMG_RTR_RPT')
+        self.assertEqual(csv_rows[1][HEADERS.index('transferSyntaxUid')],
+                         JPEG2000Lossless)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import pathlib
+import shutil
+
+from pyapp.pylibs.dicom_tools import HEADERS
+from pyapp.pylibs.transfer_store import *
+
+BASE_DIR, SCRIPT_NAME = os.path.split(os.path.abspath(__file__))
+PARENT_PATH, CURR_DIR = os.path.split(BASE_DIR)
+
+
+class TestTransferStore(unittest.TestCase):
+    """Test case class for /pyapp/pylibs/transfer_store.py"""
+
+    def setUp(self):
+        self.out_path = pathlib.Path(BASE_DIR, 'output')
+        os.makedirs(str(self.out_path), exist_ok=True)
+        self.db_path = pathlib.Path(self.out_path, 'transfers.sqlite')
+        self.conn = open_store(self.db_path)
+        self.tag_list = [HEADERS]
+        for num, (modality, aet) in enumerate([('CT', 'AET_A'),
+                                               ('CT', 'AET_B'),
+                                               ('MR', 'AET_A'),
+                                               ('CR', 'AET_C')]):
+            row = dict.fromkeys(HEADERS, '')
+            row.update({'filename': f"dump_{num}.txt",
+                        'accessionNumber': f"ACC{num:04}",
+                        'modality': modality,
+                        'sourceApplicationEntityTitle': aet,
+                        'institutionName': 'Local Hospital',
+                        'studyDate': f"2019-06-{num + 1:02}"})
+            self.tag_list.append([row[hdr] for hdr in HEADERS])
+
+    def test_sanitize_date(self):
+        self.assertEqual(sanitize_date('2019-06-09'), '20190609')
+        self.assertEqual(sanitize_date('06/09/2019'), '20190609')
+        self.assertEqual(sanitize_date('6/9/2019'), '20190609')
+        self.assertEqual(sanitize_date('2019-6-9'), '20190609')
+        self.assertEqual(sanitize_date('20190609'), '20190609')
+        self.assertEqual(sanitize_date(None), '')
+
+    def test_load_rows(self):
+        self.assertEqual(load_rows(self.conn, self.tag_list, batch_size=3),
+                         len(self.tag_list) - 1)
+        # reloading the same dumps does not duplicate transfers
+        load_rows(self.conn, self.tag_list)
+        self.assertEqual(count_rows(self.conn), len(self.tag_list) - 1)
+        self.assertEqual(load_rows(self.conn, [HEADERS]), 0)
+
+    def test_indexes(self):
+        plan = self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM transfers "
+            "WHERE sourceApplicationEntityTitle = ?", ('AET_A',)).fetchall()
+        self.assertIn('idx_sourceApplicationEntityTitle', str(plan))
+
+    def test_query_transfers(self):
+        load_rows(self.conn, self.tag_list)
+        result = query_transfers(self.conn, 'modality', 'CT')
+        self.assertEqual(result[0], HEADERS)
+        self.assertEqual(len(result), 3)
+        result = query_transfers(self.conn, 'sourceApplicationEntityTitle',
+                                 'AET_%', is_like=True)
+        self.assertEqual(len(result), 5)
+        with self.assertRaises(ValueError):
+            query_transfers(self.conn, 'modality; DROP TABLE', 'CT')
+
+    def test_query_range(self):
+        load_rows(self.conn, self.tag_list)
+        result = query_range(self.conn, '2019-06-02', '20190603')
+        self.assertEqual([row[1] for row in result[1:]],
+                         ['ACC0001', 'ACC0002'])
+        self.assertEqual(len(query_range(self.conn)), 5)
+
+    def test_pivot_transfers(self):
+        load_rows(self.conn, self.tag_list)
+        result = pivot_transfers(self.conn)
+        self.assertEqual(result[0], ['sourceApplicationEntityTitle',
+                                     'CR', 'CT', 'MR', 'total'])
+        self.assertEqual(result[1], ['AET_A', 0, 1, 1, 2])
+        self.assertEqual(sum(row[-1] for row in result[1:]), 4)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        if os.path.exists(self.out_path):
+            shutil.rmtree(self.out_path)
+
+
+if __name__ == '__main__':
+    unittest.main()